@@ -0,0 +1,67 @@
+
+import os
+import socket
+import asyncio
+import logging
+from obs_listen import Observer, play_sound, get_frontmost_window_title
+from remote import AgentClient
+from utils import setupLogger
+from config import config
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;75;1magent\u001b[0m")
+
+
+class CaptureAgent(Observer):
+    """
+    Runs next to OBS on a gaming PC and forwards replay events to an OBSClipper hub.
+    Clip files stay on this machine until the hub asks for them.
+    """
+    def __init__(self, client: AgentClient, host: str, port: int, password: str) -> None:
+        """
+        Initialize the agent.
+
+        Parameters
+        ----------
+        client: :class:`AgentClient`
+            The connection to the hub.
+        host: :class:`str`
+            The host of the OBS WebSocket server.
+        port: :class:`int`
+            The port of the OBS WebSocket server.
+        password: :class:`str`
+            The password for the OBS WebSocket server.
+        """
+        super().__init__(None, host, port, password, local=False)
+        self.client = client
+        self.loop: asyncio.AbstractEventLoop = None
+
+    def on_replay_buffer_saved(self, data) -> None:
+        filepath = data.saved_replay_path
+        if config.REMUX and filepath.endswith(".mkv") and os.path.exists(filepath[:-4] + ".mp4"):
+            filepath = filepath[:-4] + ".mp4"
+
+        if config.sound_effect:
+            log.debug("Playing sound effect...")
+            play_sound()
+        event = {
+            "file": os.path.basename(filepath),
+            "size": round(os.path.getsize(filepath) / (1024 * 1024), 2),
+            "window": get_frontmost_window_title(),
+        }
+        log.info(f"Replay Buffer Saved: {filepath} (file size: {event['size']} MB); Active Window: {event['window']})")
+        asyncio.run_coroutine_threadsafe(self.client.send_replay(event), self.loop)
+
+    async def run(self) -> None:
+        """
+        Connect to OBS and stay connected to the hub.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.connect()
+        await self.client.run()
+
+
+if __name__ == "__main__":
+    setupLogger()
+    client = AgentClient(config.agent_name or socket.gethostname(), config.hub_address, config.hub_secret, config.clips_path)
+    agent = CaptureAgent(client, host=config.OBS_HOST, port=config.OBS_PORT, password=config.OBS_PASSWORD)
+    asyncio.run(agent.run())
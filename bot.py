@@ -6,14 +6,19 @@ import asyncio
 from discord.ext.commands import Bot, CommandNotFound
 from discord.app_commands.errors import CommandNotFound as AppCommandNotFound, CommandInvokeError
 from obs_listen import Observer
-from views import DynamicUploadButton
+from views import DynamicUploadButton, DynamicStreamButton
+from clip_server import ClipServer
+from remote import ClipHub
+from stats import ClipStats
+from journal import Journal, JOURNAL_FILE
+from presence import VoiceTracker
 from config import Config, config
 
 log = logging.getLogger("VC_Bot.\u001b[38;5;82;1mBot\u001b[0m")
 
 
 
-class OBSClipper(Bot):
+class OBSClipper(VoiceTracker, Bot):
     def __init__(self):
         super().__init__(
             intents=discord.Intents.all(),
@@ -26,12 +31,22 @@ class OBSClipper(Bot):
         
         self.RECORD_USERS = False
         self.RECORD_USERS_CHANNEL = None
-        self.VC_USERS = []
+        self.VC_USERS: dict[int, discord.Member] = {}  # Member ID -> member
         self.CLIP_MESSAGES = []
         self.pending_removals = {}
         self.res = None
+        self.clip_stats = ClipStats(config.clips_path)
+        self.journal = Journal(os.path.join(config.clips_path, JOURNAL_FILE))
+        self.hub = None
+        self.clip_server = ClipServer(config.clips_path, config.clip_server_host, config.clip_server_port, config.clip_server_url) if config.clip_server else None
 
     def setup(self):
+        if config.hub:
+            # OBS runs next to the agents, which connect to the hub once the bot is running
+            log.info("Running as a hub for capture agents.")
+            self.observer = Observer(self, host=config.OBS_HOST, port=config.OBS_PORT, password=config.OBS_PASSWORD, local=False)
+            self.hub = ClipHub(config.hub_address, config.hub_secret, config.clips_path, self.observer.on_agent_replay)
+            return
         # Setup OBS
         log.info("Setting up OBS...")
         self.observer = Observer(self, host=config.OBS_HOST, port=config.OBS_PORT, password=config.OBS_PASSWORD)
@@ -51,7 +66,7 @@ class OBSClipper(Bot):
 
 
     async def on_ready(self):
-        self.add_dynamic_items(DynamicUploadButton)
+        self.add_dynamic_items(DynamicUploadButton, DynamicStreamButton)
         # Start the OBS observer
         # Connect to OBS (to make sure the connection is valid before starting the bot)
         try:
@@ -85,8 +100,8 @@ class OBSClipper(Bot):
                     log.info(f"Main user is in {channel.name} ({guild.name})")
                     self.RECORD_USERS = True
                     self.RECORD_USERS_CHANNEL = channel
-                    self.VC_USERS = [user for user in channel.members]
-                    log.info(f"VC_USERS updated: {[user.name for user in self.VC_USERS]}")
+                    self.VC_USERS = {user.id: user for user in channel.members}
+                    log.info(f"VC_USERS updated: {[user.name for user in self.VC_USERS.values()]}")
                     return True
         log.info("Main user not found in any VC.")
         return False
@@ -105,90 +120,6 @@ class OBSClipper(Bot):
             log.exception(ex)
             raise ex.__cause__
         
-    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
-        if before.channel is None and after.channel is not None:
-            # User joined a voice channel
-            if member.id == self.MY_ID.id: # Main user joined a voice channel
-                if member.name in self.pending_removals:
-                    # Cancel pending removal if they rejoin within 30 seconds
-                    self.pending_removals[member.name].cancel()
-                    del self.pending_removals[member.name]
-                    log.info(f"Cancelled removal of {member.name} (Main user) from VC_USERS")
-                
-                log.info(f"Main user joined {after.channel.name}, START RECORDING PEOPLE!")
-                self.RECORD_USERS = True
-                self.RECORD_USERS_CHANNEL = after.channel
-                self.VC_USERS = [user for user in after.channel.members]
-                log.info(f"VC_USERS updated: {[user.name for user in self.VC_USERS]}")
-            else: # User joined a voice channel
-                if self.RECORD_USERS and self.RECORD_USERS_CHANNEL == after.channel:
-                    log.info(f"{member.name} joined {after.channel.name}")
-                    if member.name in self.pending_removals:
-                        # Cancel pending removal if they rejoin within 30 seconds
-                        self.pending_removals[member.name].cancel()
-                        del self.pending_removals[member.name]
-                        log.info(f"Cancelled removal of {member.name} from VC_USERS")
-                    if member not in self.VC_USERS:
-                        log.info(f"Added {member.name} to VC_USERS")
-                        self.VC_USERS.append(member)
-
-        elif before.channel is not None and after.channel is None:
-            # User left a voice channel
-            if member.id == self.MY_ID.id:
-                log.info(f"Ovlic left {before.channel.name}, starting delay...")
-                task = asyncio.create_task(self.delayed_main_user_leave(member))
-                self.pending_removals[member.name] = task
-                # self.RECORD_USERS = False
-                # self.RECORD_USERS_CHANNEL = None
-                # self.VC_USERS = []
-            else:
-                if self.RECORD_USERS and self.RECORD_USERS_CHANNEL == before.channel:
-                    log.info(f"{member.name} left {before.channel.name}, scheduling removal in 30 seconds.")
-                    if member in self.VC_USERS:
-                        task = asyncio.create_task(self.delayed_removal(member))
-                        self.pending_removals[member.name] = task
-
-    async def delayed_removal(self, member):
-        """
-        Wait for 30 seconds before removing the user from VC_USERS.
-        This is to prevent removing users who rejoin within 30 seconds.
-        
-        Parameters
-        ----------
-        member: :class:`discord.Member`
-            The member to remove.
-        """
-        await asyncio.sleep(30)
-        if member in self.VC_USERS:
-            self.VC_USERS.remove(member)
-            log.info(f"Removed {member.name} from VC_USERS after delay.")
-        self.pending_removals.pop(member, None)
-
-    async def delayed_main_user_leave(self, member):
-        """
-        Wait for 30 seconds before stopping recording.
-        This is to prevent stopping recording if the main user rejoin within 30 seconds.
-        
-        Parameters
-        ----------
-        member: :class:`discord.Member`
-            The main user to check.
-        """
-        await asyncio.sleep(30)
-        if member in self.VC_USERS:
-            log.info(f"Ovlic has left the channel, stopping recording.")
-            # Stop recording
-            self.RECORD_USERS = False
-            self.RECORD_USERS_CHANNEL = None
-            self.VC_USERS = []
-            log.info(f"Stopped recording, VC_USERS cleared.")
-            ac = await self.attach_clips()
-            if ac == -1:
-                print("Failed to attach clips.")
-        else:
-            log.warning("Main user not in VC_USERS, not stopping recording. (Was already in VC when bot started?)")
-
-
     # Function that recieves a message (non-couroutine function) and sends it to send_clip_message
     def send_message(self, text, filepath, channel):
         """Send a message with the clip file."""
@@ -225,48 +156,18 @@ class OBSClipper(Bot):
         log.info(f"Sent clip message: {msg.id} with file: {filepath}")
 
 
-    async def attach_clips(self):
-        """Attach captured replay files to their original messages."""
-        log.info("Attaching clips to messages...")
-        if not self.clip_messages:
-            log.info("No clips to attach.")
-            return
-
-        channel = self.get_channel(self.CLIPS_CHANNEL.id)
-        if not channel:
-            log.error("Clips channel not found!")
-            return -1
-
-        log.info(f"Amount of clips to attach: {len(self.clip_messages)}")
-        to_remove = []  # Store successful message IDs for removal
-
-        for message_id, filepath in self.clip_messages[:]:  # Iterate over a copy
-            log.debug(f"Attaching clip to message {message_id}: {filepath}")
-            if os.path.exists(filepath):
-                try:
-                    msg = await channel.fetch_message(message_id)
-                    file = discord.File(filepath, filename=os.path.basename(filepath))
-
-                    # Preserve existing attachments
-                    new_attachments = msg.attachments + [file]
-
-                    await msg.edit(content=msg.content + "\n[Clip attached]", attachments=new_attachments)
-                    log.info(f"Edited message {message_id} with clip: {filepath}")
-
-                    to_remove.append((message_id, filepath))  # Mark for removal
-                except Exception as e:
-                    log.error(f"Failed to edit message {message_id}: {e}")
-            else:
-                log.warning(f"File not found: {filepath}")
-
-        # Remove processed messages after iteration
-        for item in to_remove:
-            self.clip_messages.remove(item)
-
-        log.info("Finished attaching clips.")
-
+    async def close(self):
+        await super().close()
+        # Make sure every journaled event is on disk before exiting
+        self.journal.close()
+        self.clip_stats.save()
 
     async def setup_hook(self):
+        asyncio.create_task(self.clip_stats.run())
+        if self.clip_server is not None:
+            await self.clip_server.start()
+        if self.hub is not None:
+            await self.hub.start()
         for guild in self.MY_GUILDS:
             self.tree.copy_global_to(guild=guild)
             await self.tree.sync(guild=guild)
@@ -0,0 +1,253 @@
+from __future__ import annotations
+import os, time, hmac, asyncio, hashlib, logging, secrets
+from email.utils import formatdate
+from typing import Optional
+from urllib.parse import urlsplit, parse_qs, quote, unquote
+from utils import CLIP_EXTENSIONS
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;39;1mclip_server\u001b[0m")
+
+CONTENT_TYPES = {".mp4": "video/mp4", ".mkv": "video/x-matroska"}
+REASONS = {
+    200: "OK", 206: "Partial Content", 304: "Not Modified", 400: "Bad Request", 403: "Forbidden",
+    404: "Not Found", 405: "Method Not Allowed", 416: "Range Not Satisfiable",
+}
+# Hosts that listen on every interface, which other devices can't connect to by that name
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+
+def parse_range(header:str, size:int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single byte range from a Range header.
+
+    Parameters
+    ----------
+    header: :class:`str`
+        The value of the Range header, like ``bytes=0-1023``, ``bytes=1024-`` or ``bytes=-1024``.
+    size: :class:`int`
+        The size of the file.
+
+    Returns
+    -------
+    Optional[:class:`tuple[int, int]`]
+        The first and last byte (inclusive), or ``None`` if the range can't be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None  # Multiple ranges aren't supported
+    start, _, end = spec.strip().partition("-")
+    try:
+        if start == "":
+            length = int(end)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        first = int(start)
+        last = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if first >= size or last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+class ClipServer:
+    """
+    A small HTTP server that streams clips from the clips folder to anyone with a signed link.
+    Files are sent with :meth:`asyncio.loop.sendfile`, which uses ``os.sendfile`` where it can, so memory stays flat no matter the file size.
+    """
+    def __init__(self, clips_path:str, host:str, port:int, base_url:Optional[str] = None, secret:Optional[bytes] = None) -> None:
+        """
+        Initialize the server.
+
+        Parameters
+        ----------
+        clips_path: :class:`str`
+            The path to the clips folder.
+        host: :class:`str`
+            The host to listen on.
+        port: :class:`int`
+            The port to listen on.
+        base_url: Optional[:class:`str`]
+            The URL other devices use to reach the server. Defaults to ``http://host:port``, so it's required when the host is a wildcard address.
+        secret: Optional[:class:`bytes`]
+            The key used to sign links. Defaults to a random key, so links stop working when the bot restarts.
+
+        Raises
+        ------
+        ValueError
+            The host is a wildcard address and there's no base URL, so links would point nowhere.
+        """
+        if base_url is None and host in WILDCARD_HOSTS:
+            raise ValueError(f"The clip server listens on {host or 'every interface'}, so clip_server_url must be set to an address other devices can reach (e.g. http://192.168.1.5:{port})")
+        self.clips_path = clips_path
+        self.host = host
+        self.port = port
+        self.base_url = (base_url or f"http://{host}:{port}").rstrip("/")
+        self._secret = secret or secrets.token_bytes(32)
+        self._server: asyncio.AbstractServer = None
+
+    def _signature(self, name:str, expires:int) -> str:
+        return hmac.new(self._secret, f"{name}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+    def sign(self, name:str, ttl:int) -> str:
+        """
+        Get a link to a clip that expires.
+
+        Parameters
+        ----------
+        name: :class:`str`
+            The file name of the clip.
+        ttl: :class:`int`
+            How long the link works for in seconds.
+
+        Returns
+        -------
+        :class:`str`
+            The link.
+        """
+        expires = int(time.time()) + ttl
+        return f"{self.base_url}/clips/{quote(name)}?e={expires}&s={self._signature(name, expires)}"
+
+    def verify(self, name:str, query:dict) -> bool:
+        """
+        Check the signature and expiry of a link.
+        """
+        try:
+            expires = int(query["e"][0])
+            signature = query["s"][0]
+        except (KeyError, ValueError):
+            return False
+        return expires >= time.time() and hmac.compare_digest(signature, self._signature(name, expires))
+
+    def resolve(self, name:str) -> Optional[str]:
+        """
+        Get the path of a clip, making sure it's a clip directly inside the clips folder.
+        """
+        if os.path.basename(name) != name or name.startswith(".") or not name.endswith(CLIP_EXTENSIONS):
+            return None
+        path = os.path.join(self.clips_path, name)
+        return path if os.path.isfile(path) else None
+
+    async def start(self) -> None:
+        """
+        Start listening.
+        """
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        log.info(f"Clip server listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        """
+        Stop listening and wait for the server to close.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            log.info("Clip server stopped.")
+
+    async def _handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=30)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                keep_alive = await self._respond(head.decode("latin-1"), writer)
+        except (ConnectionError, OSError) as e:
+            log.debug(f"Connection from {peer} closed: {e}")
+        finally:
+            writer.close()
+
+    def _write_head(self, writer:asyncio.StreamWriter, status:int, headers:dict) -> None:
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}"] + [f"{key}: {value}" for key, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def _error(self, writer:asyncio.StreamWriter, status:int, keep_alive:bool, headers:Optional[dict] = None) -> bool:
+        body = REASONS[status].encode()
+        self._write_head(writer, status, {
+            "Content-Type": "text/plain", "Content-Length": len(body),
+            "Connection": "keep-alive" if keep_alive else "close", **(headers or {})
+        })
+        writer.write(body)
+        await writer.drain()
+        return keep_alive
+
+    async def _respond(self, head:str, writer:asyncio.StreamWriter) -> bool:
+        request_line, *header_lines = head.split("\r\n")
+        try:
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            return await self._error(writer, 400, False)
+        headers = {}
+        for line in header_lines:
+            key, sep, value = line.partition(":")
+            if sep:
+                headers[key.strip().lower()] = value.strip()
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+        if method not in ("GET", "HEAD"):
+            return await self._error(writer, 405, keep_alive, {"Allow": "GET, HEAD"})
+        url = urlsplit(target)
+        if not url.path.startswith("/clips/"):
+            return await self._error(writer, 404, keep_alive)
+        name = unquote(url.path[len("/clips/"):])
+        if not self.verify(name, parse_qs(url.query)):
+            return await self._error(writer, 403, keep_alive)
+        path = self.resolve(name)
+        if path is None:
+            return await self._error(writer, 404, keep_alive)
+
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            size = stat.st_size
+            etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+            response_headers = {
+                "Content-Type": CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream"),
+                "Accept-Ranges": "bytes",
+                "ETag": etag,
+                "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+                "Cache-Control": "private, max-age=3600",
+                "Connection": "keep-alive" if keep_alive else "close",
+            }
+            if headers.get("if-none-match") in (etag, "*"):
+                self._write_head(writer, 304, response_headers)
+                await writer.drain()
+                return keep_alive
+
+            status, offset, count = 200, 0, size
+            # A range is only used if the file hasn't changed since the client got its etag
+            if "range" in headers and headers.get("if-range", etag) == etag:
+                byte_range = parse_range(headers["range"], size)
+                if byte_range is None:
+                    return await self._error(writer, 416, keep_alive, {"Content-Range": f"bytes */{size}"})
+                offset, last = byte_range
+                count = last - offset + 1
+                status = 206
+                response_headers["Content-Range"] = f"bytes {offset}-{last}/{size}"
+            response_headers["Content-Length"] = count
+
+            self._write_head(writer, status, response_headers)
+            await writer.drain()
+            if method == "GET" and count:
+                await asyncio.get_running_loop().sendfile(writer.transport, file, offset, count)
+        log.debug(f"Served {name} ({status}, {count} bytes)")
+        return keep_alive
+
+
+if __name__ == "__main__":
+    # Serve a folder on localhost for testing: python clip_server.py <folder> [port]
+    import sys
+    logging.basicConfig(level=logging.DEBUG)
+
+    async def main():
+        server = ClipServer(sys.argv[1], "127.0.0.1", int(sys.argv[2]) if len(sys.argv) > 2 else 8080)
+        await server.start()
+        for entry in sorted(os.listdir(sys.argv[1])):
+            if server.resolve(entry):
+                print(server.sign(entry, 3600))
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
@@ -17,7 +17,23 @@ class Config:
         port: int,
         password: str,
         remux: Optional[bool],
-        token: str
+        token: str,
+        replay_buffer_length: Optional[int] = 30,
+        health_monitor: Optional[bool] = True,
+        remux_workers: Optional[int] = 1,
+        ffmpeg_path: Optional[str] = "ffmpeg",
+        clip_server: Optional[bool] = False,
+        clip_server_host: Optional[str] = "0.0.0.0",
+        clip_server_port: Optional[int] = 8080,
+        clip_server_url: Optional[str] = None,
+        clip_link_ttl: Optional[int] = 3600,
+        hub: Optional[bool] = False,
+        hub_address: Optional[str] = "0.0.0.0:4460",
+        hub_secret: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        previews: Optional[bool] = False,
+        preview_workers: Optional[int] = 1,
+        merge_replays: Optional[bool] = False
     ):
         """
         Initialize the configuration with the given data.
@@ -41,9 +57,41 @@ class Config:
         password: :class:`str`
             The password for the OBS WebSocket server.
         remux: Optional[:class:`bool`]
-            Whether the videos will be remuxed or not. This is used to determine whether to send the mp4 file or the mkv file of a clip. Defaults to ``False``.
+            Whether the videos will be remuxed or not. This is used to determine whether to send the mp4 file or the mkv file of a clip. If OBS doesn't remux a clip itself, it's remuxed with ffmpeg once the main user leaves VC, so it doesn't compete with OBS for the disk while it records. Defaults to ``False``.
         token: :class:`str`
             The token for the bot.
+        replay_buffer_length: Optional[:class:`int`]
+            The maximum replay time of the OBS replay buffer in seconds. Defaults to ``30``.
+        health_monitor: Optional[:class:`bool`]
+            Whether to poll OBS for dropped frames and replay buffer status and alert the bot owner. Defaults to ``True``.
+        remux_workers: Optional[:class:`int`]
+            The maximum number of clips remuxed at once when OBS hasn't remuxed them itself. No remuxes start while the main user is in VC. Defaults to ``1``.
+        ffmpeg_path: Optional[:class:`str`]
+            The path to ffmpeg. ffprobe is expected to be next to it. Defaults to ``"ffmpeg"``.
+        clip_server: Optional[:class:`bool`]
+            Whether to run an HTTP server that streams clips over the local network, so clips too large for Discord can still be shared with a link. Defaults to ``False``.
+        clip_server_host: Optional[:class:`str`]
+            The host the clip server listens on. Defaults to ``"0.0.0.0"``.
+        clip_server_port: Optional[:class:`int`]
+            The port the clip server listens on. Defaults to ``8080``.
+        clip_server_url: Optional[:class:`str`]
+            The URL other devices use to reach the clip server (e.g. ``"http://192.168.1.5:8080"``). Defaults to the host and port, so it must be set when the host is ``"0.0.0.0"``.
+        clip_link_ttl: Optional[:class:`int`]
+            How long stream links work for in seconds. Defaults to ``3600``.
+        hub: Optional[:class:`bool`]
+            Whether the bot runs as a hub for capture agents (``agent.py``) instead of connecting to OBS itself. Defaults to ``False``.
+        hub_address: Optional[:class:`str`]
+            The address the hub listens on, or the address of the hub for an agent. Either ``"host:port"`` or ``"unix:/path/to/socket"``. Defaults to ``"0.0.0.0:4460"``.
+        hub_secret: Optional[:class:`str`]
+            The secret shared by the hub and its agents. Required in hub mode and on agents, since anyone who can reach the hub could otherwise pose as an agent. Defaults to ``None``.
+        agent_name: Optional[:class:`str`]
+            The name of an agent. Defaults to the computer's host name.
+        previews: Optional[:class:`bool`]
+            Whether to attach a preview image of a few frames to each clip message. Needs ffmpeg. Defaults to ``False``.
+        preview_workers: Optional[:class:`int`]
+            The maximum number of previews made at once. Defaults to ``1``.
+        merge_replays: Optional[:class:`bool`]
+            Whether to merge a replay into the previous one when their windows overlap, so saving twice within the replay buffer length gives one clip and one message. Needs ffmpeg. Defaults to ``False``.
         """
         self._user_id = user_id
         self._guilds = guilds
@@ -55,6 +103,22 @@ class Config:
         self._OBS_PASSWORD = password
         self._REMUX = remux
         self._TOKEN = token
+        self._replay_buffer_length = replay_buffer_length
+        self._health_monitor = health_monitor
+        self._remux_workers = remux_workers
+        self._ffmpeg_path = ffmpeg_path
+        self._clip_server = clip_server
+        self._clip_server_host = clip_server_host
+        self._clip_server_port = clip_server_port
+        self._clip_server_url = clip_server_url
+        self._clip_link_ttl = clip_link_ttl
+        self._hub = hub
+        self._hub_address = hub_address
+        self._hub_secret = hub_secret
+        self._agent_name = agent_name
+        self._previews = previews
+        self._preview_workers = preview_workers
+        self._merge_replays = merge_replays
 
     @property
     def user_id(self) -> int:
@@ -125,6 +189,118 @@ class Config:
         :class:`str`: The token for the bot.
         """
         return self._TOKEN
+    
+    @property
+    def replay_buffer_length(self) -> int:
+        """
+        :class:`int`: The maximum replay time of the OBS replay buffer in seconds.
+        """
+        return self._replay_buffer_length
+    
+    @property
+    def health_monitor(self) -> bool:
+        """
+        :class:`bool`: Whether to poll OBS for dropped frames and replay buffer status and alert the bot owner.
+        """
+        return self._health_monitor
+    
+    @property
+    def remux_workers(self) -> int:
+        """
+        :class:`int`: The maximum number of clips remuxed at once when OBS hasn't remuxed them itself. No remuxes start while the main user is in VC.
+        """
+        return self._remux_workers
+    
+    @property
+    def ffmpeg_path(self) -> str:
+        """
+        :class:`str`: The path to ffmpeg.
+        """
+        return self._ffmpeg_path
+    
+    @property
+    def clip_server(self) -> bool:
+        """
+        :class:`bool`: Whether to run an HTTP server that streams clips over the local network.
+        """
+        return self._clip_server
+    
+    @property
+    def clip_server_host(self) -> str:
+        """
+        :class:`str`: The host the clip server listens on.
+        """
+        return self._clip_server_host
+    
+    @property
+    def clip_server_port(self) -> int:
+        """
+        :class:`int`: The port the clip server listens on.
+        """
+        return self._clip_server_port
+    
+    @property
+    def clip_server_url(self) -> Optional[str]:
+        """
+        Optional[:class:`str`]: The URL other devices use to reach the clip server.
+        """
+        return self._clip_server_url
+    
+    @property
+    def clip_link_ttl(self) -> int:
+        """
+        :class:`int`: How long stream links work for in seconds.
+        """
+        return self._clip_link_ttl
+    
+    @property
+    def hub(self) -> bool:
+        """
+        :class:`bool`: Whether the bot runs as a hub for capture agents instead of connecting to OBS itself.
+        """
+        return self._hub
+    
+    @property
+    def hub_address(self) -> str:
+        """
+        :class:`str`: The address the hub listens on, or the address of the hub for an agent.
+        """
+        return self._hub_address
+    
+    @property
+    def hub_secret(self) -> Optional[str]:
+        """
+        Optional[:class:`str`]: The secret shared by the hub and its agents.
+        """
+        return self._hub_secret
+    
+    @property
+    def agent_name(self) -> Optional[str]:
+        """
+        Optional[:class:`str`]: The name of an agent.
+        """
+        return self._agent_name
+    
+    @property
+    def previews(self) -> bool:
+        """
+        :class:`bool`: Whether to attach a preview image of a few frames to each clip message.
+        """
+        return self._previews
+    
+    @property
+    def preview_workers(self) -> int:
+        """
+        :class:`int`: The maximum number of previews made at once.
+        """
+        return self._preview_workers
+    
+    @property
+    def merge_replays(self) -> bool:
+        """
+        :class:`bool`: Whether to merge a replay into the previous one when their windows overlap.
+        """
+        return self._merge_replays
 
 
 
@@ -140,6 +316,24 @@ config = Config(
     port = 4455,
     password = "password",
     remux = False,
+    replay_buffer_length = 30,
+    health_monitor = True,
+    remux_workers = 1,
+    ffmpeg_path = "ffmpeg",
+    previews = False,
+    preview_workers = 1,
+    merge_replays = False,
+    # Clip server settings
+    clip_server = False,
+    clip_server_host = "0.0.0.0",
+    clip_server_port = 8080,
+    clip_server_url = None,
+    clip_link_ttl = 3600,
+    # Hub settings
+    hub = False,
+    hub_address = "0.0.0.0:4460",
+    hub_secret = None,
+    agent_name = None,
     # Bot token
     token = ""
 )
\ No newline at end of file
@@ -0,0 +1,222 @@
+from __future__ import annotations
+import os, json, time, uuid, logging, threading
+from typing import Optional
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;178;1mjournal\u001b[0m")
+
+JOURNAL_FILE = ".obsclipper_journal.jsonl"
+
+
+class Journal:
+    """
+    An append-only journal of replay events and whether their notifications were delivered.
+
+    Appending only buffers the record in memory. A flusher thread writes and fsyncs everything buffered at once (group commit), so many events share one fsync instead of blocking on one each.
+    Events that were never delivered are kept in :attr:`pending` and can be replayed after a crash or an outage.
+    """
+    # How long the flusher waits to gather more records before an fsync
+    FLUSH_INTERVAL = 0.05
+    # Compact once this many records in the file are no longer needed
+    COMPACT_THRESHOLD = 1000
+
+    def __init__(self, path:str) -> None:
+        """
+        Initialize the journal, load its pending events and start the flusher.
+
+        Parameters
+        ----------
+        path: :class:`str`
+            The path to the journal file.
+        """
+        self.path = path
+        self.pending: dict[str, dict] = {}
+        self._cond = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._buffer: list[str] = []
+        self._seq = 0        # Records appended
+        self._durable = 0    # Records fsynced
+        self._stale = 0      # Records in the file that compaction would drop
+        self._file = None
+        self.running = True
+        self._load()
+        try:
+            self._file = open(path, "a", encoding="utf-8")
+        except OSError as e:
+            log.error(f"Could not open journal, events won't survive a restart: {e}")
+        self._thread = threading.Thread(target=self._flusher, name="journal-flusher", daemon=True)
+        self._thread.start()
+
+    def _load(self) -> None:
+        records = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn write from a crash
+                    records += 1
+                    if record.get("op") == "event":
+                        self.pending[record["id"]] = record["event"]
+                    elif record.get("op") in ("delivered", "failed"):
+                        self.pending.pop(record["id"], None)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            log.error(f"Could not read journal: {e}")
+            return
+        self._stale = records - len(self.pending)
+        log.info(f"Loaded journal: {len(self.pending)} undelivered events.")
+
+    def _append(self, record:dict) -> int:
+        # Caller holds self._cond
+        self._buffer.append(json.dumps(record))
+        self._seq += 1
+        self._cond.notify_all()
+        return self._seq
+
+    def append_event(self, event:dict) -> str:
+        """
+        Record a received event. Safe to call from any thread.
+
+        Parameters
+        ----------
+        event: :class:`dict`
+            The event data. It gets an ``id`` and ``received`` timestamp.
+
+        Returns
+        -------
+        :class:`str`
+            The ID of the event.
+        """
+        event["id"] = uuid.uuid4().hex
+        event["received"] = time.time()
+        with self._cond:
+            self.pending[event["id"]] = event
+            self._append({"op": "event", "id": event["id"], "event": event})
+        return event["id"]
+
+    def mark_delivered(self, event_id:str, message_id:Optional[int] = None) -> None:
+        """
+        Record that an event's notification was delivered. Safe to call from any thread.
+
+        Parameters
+        ----------
+        event_id: :class:`str`
+            The ID of the event.
+        message_id: Optional[:class:`int`]
+            The ID of the Discord message that was sent.
+        """
+        with self._cond:
+            if self.pending.pop(event_id, None) is None:
+                return  # Already delivered
+            self._append({"op": "delivered", "id": event_id, "message_id": message_id})
+            self._stale += 2
+
+    def mark_failed(self, event_id:str, reason:str) -> None:
+        """
+        Record that an event's notification can never be delivered, so it stops being retried. Safe to call from any thread.
+
+        Parameters
+        ----------
+        event_id: :class:`str`
+            The ID of the event.
+        reason: :class:`str`
+            Why it can't be delivered.
+        """
+        with self._cond:
+            if self.pending.pop(event_id, None) is None:
+                return
+            self._append({"op": "failed", "id": event_id, "reason": reason})
+            self._stale += 2
+
+    def _write(self, lines:list[str]) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.write("".join(line + "\n" for line in lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            log.error(f"Could not write journal: {e}")
+
+    def _flusher(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buffer and self.running:
+                    self._cond.wait()
+                if not self._buffer and not self.running:
+                    return
+                # Let more records arrive so they share the fsync
+                self._cond.wait(self.FLUSH_INTERVAL)
+            with self._file_lock:
+                with self._cond:
+                    lines, self._buffer = self._buffer, []
+                    seq = self._seq
+                self._write(lines)
+            with self._cond:
+                self._durable = max(self._durable, seq)
+
+    def compact(self) -> None:
+        """
+        Rewrite the journal with only the undelivered events.
+        """
+        with self._file_lock:
+            with self._cond:
+                pending = list(self.pending.values())
+                # Everything buffered is reflected in pending
+                buffered, self._buffer = self._buffer, []
+                seq = self._seq
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for event in pending:
+                        f.write(json.dumps({"op": "event", "id": event["id"], "event": event}) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                if self._file is not None:
+                    self._file.close()
+                self._file = open(self.path, "a", encoding="utf-8")
+            except OSError as e:
+                log.error(f"Could not compact journal: {e}")
+                with self._cond:
+                    self._buffer = buffered + self._buffer
+                return
+            with self._cond:
+                self._stale = 0
+                self._durable = max(self._durable, seq)
+        log.info(f"Compacted journal to {len(pending)} events.")
+
+    def needs_compaction(self) -> bool:
+        return self._stale >= self.COMPACT_THRESHOLD
+
+    def lag(self) -> dict:
+        """
+        Get how far behind the journal is.
+
+        Returns
+        -------
+        :class:`dict`
+            ``undelivered``: events without a delivered notification, ``oldest``: the age of the oldest one in seconds, ``unsynced``: records not fsynced yet and ``stale``: records compaction would drop.
+        """
+        with self._cond:
+            oldest = min((event["received"] for event in self.pending.values()), default=None)
+            return {
+                "undelivered": len(self.pending),
+                "oldest": round(time.time() - oldest, 1) if oldest is not None else 0,
+                "unsynced": self._seq - self._durable,
+                "stale": self._stale,
+            }
+
+    def close(self) -> None:
+        """
+        Flush everything and stop the flusher.
+        """
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
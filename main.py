@@ -1,5 +1,10 @@
 
+import io
 import discord
+import profiler
+from views import UploadClipsView, recent_clips
+from discord import app_commands
+from typing import Optional, Literal
 from bot import OBSClipper
 from discord.errors import NotFound
 from discord.app_commands.errors import CommandNotFound as AppCommandNotFound, CommandInvokeError, CheckFailure
@@ -54,8 +59,8 @@ async def get_vc_users(interaction: discord.Interaction):
     if not client.VC_USERS:
         await interaction.response.send_message("No users in VC")
         return
-    await interaction.response.send_message(", ".join([str(user.name) for user in client.VC_USERS]))
-    logger.info(f"Current VC users: {', '.join([str(user.name) for user in client.VC_USERS])}")
+    await interaction.response.send_message(", ".join([str(user.name) for user in client.VC_USERS.values()]))
+    logger.info(f"Current VC users: {', '.join([str(user.name) for user in client.VC_USERS.values()])}")
 
 @client.tree.command()
 async def search_for_user(interaction:discord.Interaction):
@@ -66,6 +71,60 @@ async def search_for_user(interaction:discord.Interaction):
         await interaction.response.send_message("No user found")
 
 
+@client.tree.command(description="Show clip stats for this server or a user")
+async def clipstats(interaction: discord.Interaction, user: Optional[discord.User] = None):
+    if user is not None:
+        scope, name = client.clip_stats.user_scope(user.id), user.name
+    elif interaction.guild is not None:
+        scope, name = client.clip_stats.guild_scope(interaction.guild.id), interaction.guild.name
+    else:
+        await interaction.response.send_message("Use this command in a server or pick a user.", ephemeral=True)
+        return
+    stats = client.clip_stats.get(scope)
+    if stats is None:
+        await interaction.response.send_message(f"No clips for {name} yet.")
+        return
+    apps = ", ".join([f"{app} ({count})" for app, count in stats["apps"]]) or "None"
+    people = ", ".join([f"<@{user_id}> ({count})" for user_id, count in stats["people"]]) or "None"
+    await interaction.response.send_message(
+        f"Clip stats for {name}\n"
+        f"Clips: {stats['clips']} ({stats['clips_per_day']} per day)\n"
+        f"Storage: {round(stats['bytes'] / (1024 * 1024 * 1024), 2)} GB\n"
+        f"Most clipped apps: {apps}\n"
+        f"Most present: {people}\n"
+        f"Uploaded/ignored: {stats['uploaded']}/{stats['ignored']}",
+        allowed_mentions=discord.AllowedMentions.none()
+    )
+
+
+def is_owner(interaction: discord.Interaction) -> bool:
+    return interaction.user.id == client.MY_ID.id
+
+
+@client.tree.command(description="Profile the bot (owner only)")
+@app_commands.check(is_owner)
+async def profile(interaction: discord.Interaction, seconds: app_commands.Range[int, 1, 300], mode: Literal["cpu", "mem", "loop"] = "cpu"):
+    await interaction.response.defer(thinking=True)
+    try:
+        summary, reports = await profiler.capture(seconds, mode)
+    except RuntimeError as e:
+        await interaction.followup.send(str(e), ephemeral=True)
+        return
+    files = [discord.File(io.BytesIO(data), filename=name) for name, data in reports]
+    await interaction.followup.send(summary, files=files)
+    logger.info(f"Sent {mode} profile: {summary}")
+
+
+@client.tree.command(description="Upload several recent clips at once")
+@app_commands.check(is_owner)
+async def upload_clips(interaction: discord.Interaction):
+    names = recent_clips(client)
+    if not names:
+        await interaction.response.send_message("No clips found.", ephemeral=True)
+        return
+    await interaction.response.send_message("Pick the clips to upload:", view=UploadClipsView(names, interaction.user.id), ephemeral=True)
+
+
 @client.tree.command()
 async def kill_obs(interaction:discord.Interaction):
     await interaction.response.defer()
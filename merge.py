@@ -0,0 +1,127 @@
+from __future__ import annotations
+import os, asyncio, logging
+from typing import Optional
+from config import config
+from remux import get_duration, low_priority_kwargs, low_priority_prefix
+from utils import parse_clip_time
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;209;1mmerge\u001b[0m")
+
+
+class ReplayMerger:
+    """
+    Merges replays whose windows overlap into one continuous clip with ffmpeg.
+    Streams are copied, not re-encoded: the merged clip is the first replay up to where the second one starts, followed by all of the second one.
+    """
+    # Allowed differences between the merged clip and the union of the windows
+    MIN_SIZE_RATIO = 0.9
+    MAX_DURATION_DIFFERENCE = 1.0
+
+    def __init__(self) -> None:
+        # Merges depend on the clip before them, so only one runs at a time
+        self.lock = asyncio.Lock()
+
+    @staticmethod
+    async def window(clip_path:str) -> Optional[tuple[float, float]]:
+        """
+        Get the time span a replay covers.
+
+        Parameters
+        ----------
+        clip_path: :class:`str`
+            The path to the replay.
+
+        Returns
+        -------
+        Optional[:class:`tuple[float, float]`]
+            The start and end as UNIX timestamps, or ``None`` if the file name has no timestamp.
+        """
+        end = parse_clip_time(clip_path)
+        if end is None:
+            return None
+        # Replays end when they're saved and are never longer than the replay buffer
+        duration = await get_duration(clip_path) or config.replay_buffer_length
+        return end.timestamp() - duration, end.timestamp()
+
+    @staticmethod
+    def overlaps(first:tuple[float, float], second:tuple[float, float]) -> bool:
+        """
+        Check if the second window starts during the first one and ends after it.
+        """
+        return first[0] < second[0] < first[1] < second[1]
+
+    async def merge(self, first_path:str, first:tuple[float, float], second_path:str, second:tuple[float, float], out_path:str) -> bool:
+        """
+        Merge two overlapping replays into one clip covering both windows.
+
+        Parameters
+        ----------
+        first_path: :class:`str`
+            The path to the earlier replay.
+        first: :class:`tuple[float, float]`
+            The window of the earlier replay from :meth:`window`.
+        second_path: :class:`str`
+            The path to the later replay.
+        second: :class:`tuple[float, float]`
+            The window of the later replay from :meth:`window`.
+        out_path: :class:`str`
+            Where to write the merged clip. The container is picked from the extension.
+
+        Returns
+        -------
+        :class:`bool`
+            True if the merged clip was written and checked.
+        """
+        list_path = out_path + ".concat.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            # Only the part of the first replay from before the second one starts
+            f.write(f"file '{self._quote(first_path)}'\noutpoint {second[0] - first[0]:.3f}\n")
+            f.write(f"file '{self._quote(second_path)}'\n")
+        cmd = low_priority_prefix() + [
+            config.ffmpeg_path, "-nostdin", "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path, "-map", "0", "-c", "copy",
+        ]
+        if out_path.endswith(".mp4"):
+            cmd += ["-movflags", "+faststart", "-f", "mp4"]
+        else:
+            cmd += ["-f", "matroska"]
+        tmp_path = out_path + ".part"
+        try:
+            proc = await asyncio.create_subprocess_exec(*cmd, tmp_path, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE, **low_priority_kwargs())
+        except OSError as e:
+            log.error(f"Could not start ffmpeg: {e}")
+            os.remove(list_path)
+            return False
+        _, stderr = await proc.communicate()
+        os.remove(list_path)
+        if proc.returncode != 0:
+            log.error(f"ffmpeg failed to merge {os.path.basename(first_path)} and {os.path.basename(second_path)}: {stderr.decode(errors='replace').strip()}")
+        elif await self.verify(second_path, tmp_path, second[1] - first[0]):
+            os.replace(tmp_path, out_path)
+            log.info(f"Merged {os.path.basename(first_path)} and {os.path.basename(second_path)} into {os.path.basename(out_path)}")
+            return True
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    async def verify(self, second_path:str, merged_path:str, duration:float) -> bool:
+        """
+        Check that a merged clip is at least as large as the later replay and as long as both windows.
+        """
+        second_size, merged_size = os.path.getsize(second_path), os.path.getsize(merged_path)
+        if merged_size < second_size * self.MIN_SIZE_RATIO:
+            log.warning(f"Merged file is too small: {merged_size} bytes (later replay is {second_size} bytes)")
+            return False
+        merged_duration = await get_duration(merged_path)
+        if merged_duration is None:
+            log.debug("Could not get the merged duration, only checked size.")
+            return True
+        if abs(merged_duration - duration) > self.MAX_DURATION_DIFFERENCE:
+            log.warning(f"Merged duration {merged_duration}s doesn't match the windows ({duration}s)")
+            return False
+        return True
+
+    @staticmethod
+    def _quote(path:str) -> str:
+        # Quoting for ffmpeg's concat lists
+        return os.path.abspath(path).replace("'", "'\\''")
@@ -0,0 +1,234 @@
+from __future__ import annotations
+import time, asyncio, logging, threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+import obsws_python as obs
+
+# Add type checking for the bot variable
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from bot import OBSClipper
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;208;1mobs_health\u001b[0m")
+
+
+@dataclass
+class HealthSample:
+    """
+    One sample of OBS's stats. Frame counts are cumulative for the session.
+    """
+    time: float
+    cpu_usage: float
+    active_fps: float
+    disk_space: float
+    render_skipped: int
+    render_total: int
+    output_skipped: int
+    output_total: int
+    replay_buffer_active: bool
+
+
+class HealthMonitor:
+    """
+    Polls OBS's stats and replay buffer status on its own request connection and alerts the bot owner when something is wrong.
+    """
+    # Poll intervals in seconds
+    FAST_INTERVAL = 2
+    NORMAL_INTERVAL = 10
+    IDLE_INTERVAL = 60
+
+    # Alert thresholds
+    MAX_DROPPED_PERCENT = 1.0
+    MAX_CPU_USAGE = 90.0
+    MIN_DISK_SPACE = 5 * 1024  # MB
+
+    def __init__(self, bot, host:str, port:int, password:str, size:int = 512) -> None:
+        """
+        Initialize the monitor.
+
+        Parameters
+        ----------
+        bot: :class:`OBSClipper`
+            The bot instance, used to check if the main user is in VC and to alert the owner.
+        host: :class:`str`
+            The host of the OBS WebSocket server.
+        port: :class:`int`
+            The port of the OBS WebSocket server.
+        password: :class:`str`
+            The password for the OBS WebSocket server.
+        size: :class:`int`
+            How many samples to keep.
+        """
+        self.bot: OBSClipper = bot
+        self.host = host
+        self.port = port
+        self.password = password
+        self.samples: deque[HealthSample] = deque(maxlen=size)
+        self.problems: set[str] = set()
+        self.running = False
+        self._client: obs.ReqClient = None
+        self._lock = threading.Lock()  # ReqClient is not safe to share between threads
+
+    def _sample(self) -> Optional[HealthSample]:
+        with self._lock:
+            try:
+                if self._client is None:
+                    self._client = obs.ReqClient(host=self.host, port=self.port, password=self.password, timeout=3)
+                stats = self._client.get_stats()
+                replay = self._client.get_replay_buffer_status()
+            except Exception as e:  # Connection errors come from both obsws and websocket
+                log.warning(f"Could not get OBS stats: {e}")
+                self._disconnect()
+                return None
+            # Timed while holding the lock, so samples finish in the order of their times
+            return HealthSample(
+                time=time.time(),
+                cpu_usage=stats.cpu_usage,
+                active_fps=stats.active_fps,
+                disk_space=stats.available_disk_space,
+                render_skipped=stats.render_skipped_frames,
+                render_total=stats.render_total_frames,
+                output_skipped=stats.output_skipped_frames,
+                output_total=stats.output_total_frames,
+                replay_buffer_active=replay.output_active,
+            )
+
+    def _disconnect(self) -> None:
+        if self._client is not None:
+            try:
+                self._client.disconnect()
+            except Exception:
+                pass
+            self._client = None
+
+    async def sample(self) -> Optional[HealthSample]:
+        """
+        Take a sample now.
+
+        Returns
+        -------
+        Optional[:class:`HealthSample`]
+            The sample, or ``None`` if OBS couldn't be reached.
+        """
+        sample = await asyncio.to_thread(self._sample)
+        # Only the event loop touches the samples, so reading them never races with this
+        if sample is not None:
+            self.samples.append(sample)
+        return sample
+
+    def dropped_frames(self, start:float, end:float) -> Optional[float]:
+        """
+        Get the percentage of frames skipped by the renderer or the encoder between two times.
+
+        Parameters
+        ----------
+        start: :class:`float`
+            The start of the window as a UNIX timestamp.
+        end: :class:`float`
+            The end of the window as a UNIX timestamp.
+
+        Returns
+        -------
+        Optional[:class:`float`]
+            The percentage, or ``None`` if there isn't a sample from at or before the start and one from at or after the end.
+        """
+        before = after = None
+        for sample in self.samples:
+            if sample.time <= start:
+                before = sample
+            if sample.time >= end:
+                after = sample
+                break
+        # Samples from inside the window would give the dropped frames of a different window
+        if before is None or after is None or after is before:
+            return None
+        if after.output_total < before.output_total:
+            return None  # Output was restarted inside the window
+        total = (after.render_total - before.render_total) + (after.output_total - before.output_total)
+        skipped = (after.render_skipped - before.render_skipped) + (after.output_skipped - before.output_skipped)
+        if total <= 0:
+            return None
+        return round(skipped / total * 100, 2)
+
+    def check(self, sample:HealthSample, previous:Optional[HealthSample]) -> set[str]:
+        """
+        Find what's wrong in a sample.
+
+        Parameters
+        ----------
+        sample: :class:`HealthSample`
+            The latest sample.
+        previous: Optional[:class:`HealthSample`]
+            The sample before it, to get the dropped frames since then.
+
+        Returns
+        -------
+        :class:`set[str]`
+            A description of each problem. These don't include numbers so the same problem isn't alerted twice.
+        """
+        problems = set()
+        if previous is not None:
+            dropped = self.dropped_frames(previous.time, sample.time)
+            if dropped is not None and dropped > self.MAX_DROPPED_PERCENT:
+                problems.add("Dropping frames")
+        if sample.cpu_usage > self.MAX_CPU_USAGE:
+            problems.add("High CPU usage")
+        if sample.disk_space < self.MIN_DISK_SPACE:
+            problems.add("Low disk space")
+        if not sample.replay_buffer_active and self.bot.RECORD_USERS:
+            problems.add("Replay buffer is not running")
+        return problems
+
+    async def alert(self, problems:set[str], sample:HealthSample) -> None:
+        """
+        DM the bot owner about new problems.
+        """
+        previous = self.samples[-2] if len(self.samples) > 1 else None
+        dropped = self.dropped_frames(previous.time, sample.time) if previous else None
+        try:
+            owner = self.bot.get_user(self.bot.MY_ID.id) or await self.bot.fetch_user(self.bot.MY_ID.id)
+            await owner.send(
+                f"OBS health warning: {', '.join(sorted(problems))}\n"
+                f"CPU: {round(sample.cpu_usage, 1)}%, FPS: {round(sample.active_fps, 1)}, Dropped frames: {dropped if dropped is not None else '?'}%, Disk: {round(sample.disk_space / 1024, 2)} GB"
+            )
+        except Exception as e:
+            log.error(f"Could not alert owner: {e}")
+
+    def interval(self) -> float:
+        """
+        How long to wait until the next sample. Faster while something is wrong, slower while the main user isn't in VC.
+        """
+        if self.problems:
+            return self.FAST_INTERVAL
+        if not self.bot.RECORD_USERS:
+            return self.IDLE_INTERVAL
+        return self.NORMAL_INTERVAL
+
+    async def run(self) -> None:
+        """
+        Poll OBS until :meth:`stop` is called.
+        """
+        self.running = True
+        log.info("OBS health monitor started.")
+        while self.running:
+            previous = self.samples[-1] if self.samples else None
+            sample = await self.sample()
+            if sample is not None:
+                problems = self.check(sample, previous)
+                new = problems - self.problems
+                if new:
+                    log.warning(f"OBS health: {', '.join(sorted(problems))}")
+                    await self.alert(new, sample)
+                elif self.problems and not problems:
+                    log.info("OBS health back to normal.")
+                self.problems = problems
+            await asyncio.sleep(self.interval())
+
+    def stop(self) -> None:
+        """
+        Stop polling and close the request connection.
+        """
+        self.running = False
+        with self._lock:
+            self._disconnect()
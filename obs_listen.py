@@ -1,10 +1,17 @@
 from __future__ import annotations
-import os, asyncio, logging, sys, socket
+import os, re, time, asyncio, logging, sys, socket
+import discord
+import aiohttp
 import obsws_python as obs
 from obsws_python.error import OBSSDKError
 from views import DynamicUploadView
+from obs_health import HealthMonitor
+from remux import RemuxPool
+from previews import PreviewPool, preview_path
+from merge import ReplayMerger
 from datetime import datetime
 from config import config
+from utils import parse_clip_time
 
 # Add type checking for the bot variable
 from typing import TYPE_CHECKING
@@ -13,7 +20,11 @@ if TYPE_CHECKING:
 
 # Set up sound effects and window title (different libraries depending on OS)
 if sys.platform != "win32":
-    from AppKit import NSWorkspace
+    try:
+        from AppKit import NSWorkspace
+    except ImportError:
+        # Not on macOS (e.g. a Linux hub), so there's no window title to get
+        NSWorkspace = None
     def get_frontmost_window_title() -> str:
         """
         Retrieves the title of the frontmost window in unix-like systems.
@@ -23,6 +34,8 @@ if sys.platform != "win32":
         :class:`str`
             The title of the frontmost window.
         """
+        if NSWorkspace is None:
+            return None
         frontmost_app = NSWorkspace.sharedWorkspace().frontmostApplication()
         if frontmost_app:
             return frontmost_app.localizedName()
@@ -61,11 +74,17 @@ else:
 
 log = logging.getLogger("VC_Bot.\u001b[38;5;166;1masnync_obs\u001b[0m")
 
+# Errors from Discord being unreachable, which don't count as failed delivery attempts
+TRANSIENT_ERRORS = (discord.DiscordServerError, aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)
+
 class Observer:
     """
     OBS WebSocket client that listens for events and sends messages to Discord.
     """
-    def __init__(self, bot, host:str, port:int, password:str) -> None:
+    # Failed attempts to deliver a notification while Discord is reachable before giving up on it
+    MAX_DELIVERY_ATTEMPTS = 5
+
+    def __init__(self, bot, host:str, port:int, password:str, local:bool = True) -> None:
         """
         Initialize the OBS WebSocket client and register event callbacks.
 
@@ -82,13 +101,32 @@ class Observer:
 
         password: :class:`str`
             The password for the OBS WebSocket server.
+
+        local: :class:`bool`
+            Whether OBS runs on this machine. When the bot is a hub, events come from agents instead and OBS isn't connected to.
         """
         self.bot: OBSClipper = bot
+        self.local = local
         self.host = host
         self.port = port
         self.password = password
         self.running = False
         self._client:obs.EventClient = None # obs.EventClient(host=host, port=port, password=password)
+        self.health: HealthMonitor = HealthMonitor(bot, host, port, password) if config.health_monitor and local else None
+        self.remuxer: RemuxPool = RemuxPool(bot, config.remux_workers) if config.REMUX and local else None
+        self.previews: PreviewPool = PreviewPool(config.preview_workers) if config.previews and local else None
+        if self.previews is not None and not self.previews.available:
+            self.previews = None
+        self.merger: ReplayMerger = ReplayMerger() if config.merge_replays and local else None
+        self._last: dict = None  # The latest replay, which the next one may be merged into
+        self._tasks: set[asyncio.Task] = set()  # Background work for sent messages
+        self._delivering: set[str] = set()  # IDs of journal events being delivered right now
+        self._failures: dict[str, int] = {}  # Journal event ID -> failed delivery attempts
+        self._health_samples: dict[str, asyncio.Task] = {}  # Journal event ID -> OBS stats sampled when it was saved
+        self._edit_lock = asyncio.Lock()  # Clip messages are edited one at a time
+        # Background loops, kept so reconnects don't start them twice
+        self._health_task: asyncio.Task = None
+        self._journal_task: asyncio.Task = None
         
 
     def __enter__(self):
@@ -111,24 +149,447 @@ class Observer:
         # for attr in data.attrs():
         #     print(f"{attr}: {getattr(data, attr)}")
         filepath = data.saved_replay_path
+        remux_path = None
         # NOTE: Change this if you want to send the mp4 file instead of the mkv file
         if config.REMUX:
             if filepath.endswith(".mkv"):
-                filepath = filepath[:-4] + ".mp4"
+                if os.path.exists(filepath[:-4] + ".mp4"):
+                    filepath = filepath[:-4] + ".mp4"
+                else:
+                    # Point at the mkv until the mp4 is ready
+                    remux_path = filepath
         
         if config.sound_effect:
             log.debug("Playing sound effect...")
             play_sound()
-        active_window = get_frontmost_window_title()
+        context = self.get_context()
         file_size = round(os.path.getsize(filepath) / (1024 * 1024), 2)
-        log.info(f"Replay Buffer Saved: {filepath} (file size: {file_size} MB); Active Window: {active_window})")
+        log.info(f"Replay Buffer Saved: {filepath} (file size: {file_size} MB); Active Window: {context['window']})")
 
-        # Get the ending of the file path
-        file_name = os.path.basename(filepath)
+        # Journal the event before anything else so it survives a crash or an outage
+        event = {"file": os.path.basename(filepath), "size": file_size, "remux_path": remux_path, "context": context}
+        self.bot.journal.append_event(event)
+        if self.health is not None:
+            # Sampled on the loop so nothing here waits on OBS, and it's scheduled before the delivery that looks it up
+            self.bot.loop.call_soon_threadsafe(self.sample_health, event["id"])
         # Send message to Discord
-        asyncio.run_coroutine_threadsafe(self.notify_discord(file_name, file_size), self.bot.loop)
+        asyncio.run_coroutine_threadsafe(self.handle_replay(event), self.bot.loop)
+
+    def on_agent_replay(self, agent:str, data:dict) -> None:
+        """
+        Called by the hub when an agent saves a replay.
+
+        Parameters
+        ----------
+        agent: :class:`str`
+            The name of the agent.
+        data: :class:`dict`
+            The replay from the agent, with the ``file`` name, ``size`` in MB and active ``window``.
+        """
+        log.info(f"Replay Buffer Saved on {agent}: {data['file']} (file size: {data['size']} MB)")
+        event = {"file": data["file"], "size": data["size"], "remux_path": None, "context": self.get_context(data.get("window")), "agent": agent}
+        self.bot.journal.append_event(event)
+        asyncio.create_task(self.handle_replay(event))
+
+    def sample_health(self, event_id:str) -> None:
+        """
+        Sample OBS's stats as a replay is saved, so its dropped frames can be added once its message is sent.
+
+        Parameters
+        ----------
+        event_id: :class:`str`
+            The ID of the replay's journal event.
+        """
+        self._health_samples[event_id] = asyncio.create_task(self.health.sample())
+
+    def get_context(self, window:str = None) -> dict:
+        """
+        Get who is in VC and what is on screen right now, to send with a clip.
+
+        Parameters
+        ----------
+        window: Optional[:class:`str`]
+            The active window, if it's already known. Defaults to the frontmost window on this machine.
+
+        Returns
+        -------
+        :class:`dict`
+            ``window``: the active window, ``members``: a list of [id, name] of the users in VC and ``guild``: the ID of the VC's guild (or ``None``).
+        """
+        if self.bot.RECORD_USERS:
+            # This runs on OBS's thread while the loop updates VC_USERS, so copy it before iterating
+            members = [[user.id, user.name] for user in list(self.bot.VC_USERS.values())]
+            channel = self.bot.RECORD_USERS_CHANNEL
+            guild = channel.guild.id if channel else None
+        else:
+            members, guild = [], None
+        return {"window": window or get_frontmost_window_title(), "members": members, "guild": guild}
+
+    async def handle_replay(self, event:dict) -> None:
+        """
+        Notify Discord about a journaled replay event, then remux it if needed.
+
+        Parameters
+        ----------
+        event: :class:`dict`
+            The journal event, with the file name, size in MB, mkv path to remux (or ``None``) and context of the replay.
+        """
+        if event["id"] in self._delivering:
+            return
+        self._delivering.add(event["id"])
+        health = self._health_samples.pop(event["id"], None)
+        last = None
+        try:
+            if parse_clip_time(event["file"]) is None:
+                # The message needs the time from the file name, so this can never be delivered
+                self.bot.journal.mark_failed(event["id"], "file name has no timestamp")
+                log.error(f"Giving up on replay {event['file']}: the file name has no timestamp.")
+                return
+            clip_path = event["remux_path"] or os.path.join(config.clips_path, event["file"])
+            if self.merger is not None:
+                last = await self.track_replay(event, clip_path)
+                if last is None:
+                    return
+            message = await self.notify_discord(event["file"], event["size"], event["context"])
+            if message is not None:
+                self.bot.journal.mark_delivered(event["id"], message.id)
+                self._failures.pop(event["id"], None)
+                if last is not None:
+                    last["message"] = message
+                if self.previews is not None:
+                    # The preview is edited in once it's ready, the notification never waits for it
+                    preview = self.start_preview(message, clip_path)
+                    if last is not None:
+                        last["preview"] = preview
+                if health is not None:
+                    self._background(self.attach_health(message, parse_clip_time(event["file"]).timestamp(), health))
+            elif self.bot.get_channel(self.bot.CLIPS_CHANNEL.id) is not None:
+                # Discord is reachable, so something about the event itself failed
+                self.delivery_failed(event, "no message was sent")
+            remux = None
+            if event["remux_path"] is not None:
+                remux = asyncio.create_task(self.remux_replay(message, event, last))
+                if last is not None:
+                    last["remux"] = remux
+            if last is not None:
+                # The next replay only needs this one's message, a merge waits for the remux itself
+                last["sent"].set()
+            if remux is not None:
+                await asyncio.wait([remux])
+                # Cancelled when the replay was merged into the next one before its remux started
+                if not remux.cancelled():
+                    remux.result()
+        except TRANSIENT_ERRORS as e:
+            log.error(f"Discord unavailable while delivering replay {event['file']}, will retry: {e}")
+        except Exception as e:
+            log.error(f"Error delivering replay {event['file']}: {e}")
+            self.delivery_failed(event, str(e))
+        finally:
+            if last is not None:
+                last["sent"].set()
+            self._delivering.discard(event["id"])
+
+    def delivery_failed(self, event:dict, reason:str) -> None:
+        """
+        Count a failed attempt to deliver a replay's notification, giving up after :attr:`MAX_DELIVERY_ATTEMPTS`.
+
+        Parameters
+        ----------
+        event: :class:`dict`
+            The journal event of the replay.
+        reason: :class:`str`
+            Why the attempt failed.
+        """
+        if event["id"] not in self.bot.journal.pending:
+            return  # Delivered, only the work after it failed
+        attempts = self._failures.get(event["id"], 0) + 1
+        if attempts < self.MAX_DELIVERY_ATTEMPTS:
+            self._failures[event["id"]] = attempts
+            log.warning(f"Delivering replay {event['file']} failed ({attempts}/{self.MAX_DELIVERY_ATTEMPTS}), will retry: {reason}")
+            return
+        self._failures.pop(event["id"], None)
+        self.bot.journal.mark_failed(event["id"], reason)
+        log.error(f"Giving up on replay {event['file']} after {attempts} attempts: {reason}")
+
+    def start_preview(self, message:discord.Message, clip_path:str) -> asyncio.Task:
+        """
+        Attach a preview to a clip's message in the background.
+        """
+        return self._background(self.attach_preview(message, clip_path))
+
+    def _background(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
 
-    async def notify_discord(self, filepath:str, file_size:float) -> None:
+    async def track_replay(self, event:dict, clip_path:str):
+        """
+        Merge a replay into the previous one if their windows overlap. Otherwise, it becomes the replay the next one may be merged into.
+
+        Parameters
+        ----------
+        event: :class:`dict`
+            The journal event of the replay.
+        clip_path: :class:`str`
+            The full path to the replay.
+
+        Returns
+        -------
+        Optional[:class:`dict`]
+            The tracked replay, whose ``message``, ``preview`` and ``remux`` should be set as it's delivered and ``sent`` set after. ``None`` if the replay was merged and needs no message of its own.
+        """
+        async with self.merger.lock:
+            last = self._last
+            if last is not None:
+                # The previous replay's message may not be sent yet
+                await last["sent"].wait()
+                if await self.merge_replay(last, event, clip_path):
+                    return None
+            self._last = {"event": event, "message": None, "path": clip_path, "window": None, "preview": None, "remux": None, "sent": asyncio.Event()}
+            return self._last
+
+    async def merge_replay(self, last:dict, event:dict, clip_path:str) -> bool:
+        """
+        Merge a replay into the previous one and point the previous one's message at the merged clip.
+
+        Parameters
+        ----------
+        last: :class:`dict`
+            The previous replay from :meth:`track_replay`.
+        event: :class:`dict`
+            The journal event of the new replay.
+        clip_path: :class:`str`
+            The full path to the new replay.
+
+        Returns
+        -------
+        :class:`bool`
+            True if the replays were merged.
+        """
+        message = last["message"]
+        if message is None or not os.path.exists(last["path"]) or not os.path.exists(clip_path):
+            return False
+        first = last["window"] or await self.merger.window(last["path"])
+        second = await self.merger.window(clip_path)
+        if first is None or second is None or not self.merger.overlaps(first, second):
+            return False
+        if last["remux"] is not None:
+            if not self.remuxer.is_running(last["event"]["remux_path"]):
+                # Remuxes wait for the main user to leave VC, and the merged clip is an mp4 anyway
+                last["remux"].cancel()
+            # Otherwise merge the finished mp4, so the remux can't write one next to the merged clip
+            await asyncio.gather(last["remux"], return_exceptions=True)
+            if not os.path.exists(last["path"]):
+                return False
+        # The merged clip takes the new replay's name, since clips are named after when they end
+        out_path = RemuxPool.mp4_path(clip_path) if config.REMUX else clip_path
+        base, ext = os.path.splitext(out_path)
+        merged_path = base + ".merged" + ext
+        if not await self.merger.merge(last["path"], first, clip_path, second, merged_path):
+            return False
+
+        if last["preview"] is not None:
+            # Otherwise it could write the old preview again after it's deleted, or attach it after the edit
+            await asyncio.gather(last["preview"], return_exceptions=True)
+        new_name = os.path.basename(out_path)
+        new_size = round(os.path.getsize(merged_path) / (1024 * 1024), 2)
+        try:
+            # The old preview no longer matches the clip
+            await self.edit_content(
+                message,
+                lambda content: re.sub(r"File info: `[^`]+` \([\d.]+ MB\)", lambda _: f"File info: `{new_name}` ({new_size} MB)", content),
+                filepath=new_name, attachments=[],
+            )
+        except Exception as e:
+            log.error(f"Error updating message with merged clip: {e}")
+            os.remove(merged_path)
+            return False
+        os.replace(merged_path, out_path)
+        # The previous replay's mkv is left over too if it was remuxed, and so is an mp4 OBS wrote for it if its remux was cancelled
+        leftovers = {last["path"], clip_path, preview_path(last["path"])}
+        if last["event"]["remux_path"] is not None:
+            leftovers |= {last["event"]["remux_path"], RemuxPool.mp4_path(last["event"]["remux_path"])}
+        for path in leftovers - {out_path}:
+            if os.path.exists(path):
+                os.remove(path)
+        self.bot.journal.mark_delivered(event["id"], message.id)
+        # The merged clip is counted as the previous one, which is where its context was recorded
+        self.bot.clip_stats.rename(os.path.basename(last["path"]), new_name, os.path.getsize(out_path))
+        log.info(f"Updated message {message.id} with merged clip: {new_name}")
+        last.update(path=out_path, window=(first[0], second[1]), preview=None)
+        if self.previews is not None:
+            last["preview"] = self.start_preview(message, out_path)
+        return True
+
+    async def redeliver(self, min_age:float = 0) -> None:
+        """
+        Send the notifications of journaled events that were never delivered.
+        Events whose message is already in the clips channel are only marked as delivered, so nothing is sent twice.
+
+        Parameters
+        ----------
+        min_age: :class:`float`
+            Skip events received less than this many seconds ago, since they may still be on their way.
+        """
+        events = [event for event in list(self.bot.journal.pending.values()) if time.time() - event["received"] >= min_age and event["id"] not in self._delivering]
+        if not events:
+            return
+        channel = self.bot.get_channel(self.bot.CLIPS_CHANNEL.id)
+        if not channel:
+            log.warning(f"Could not find Discord channel, {len(events)} notifications still undelivered.")
+            return
+        log.info(f"Redelivering {len(events)} notifications...")
+        sent = {}
+        try:
+            async for message in channel.history(limit=100):
+                if message.author.id == self.bot.user.id:
+                    sent[message.content] = message.id
+        except Exception as e:
+            log.error(f"Could not read clips channel history: {e}")
+            return
+        for event in events:
+            names = {event["file"], RemuxPool.mp4_path(event["file"])}
+            message_id = next((message_id for content, message_id in sent.items() if any(f"`{name}`" in content for name in names)), None)
+            if message_id is not None:
+                self.bot.journal.mark_delivered(event["id"], message_id)
+            else:
+                await self.handle_replay(event)
+
+    async def maintain_journal(self, interval:float = 60) -> None:
+        """
+        Retry undelivered notifications, report the journal's lag and compact it while the observer is running.
+        """
+        await self.redeliver()
+        while self.running:
+            await asyncio.sleep(interval)
+            lag = self.bot.journal.lag()
+            if lag["undelivered"]:
+                log.warning(f"Journal lag: {lag['undelivered']} undelivered (oldest {lag['oldest']}s), {lag['unsynced']} unsynced")
+                await self.redeliver(min_age=interval)
+            if self.bot.journal.needs_compaction():
+                await asyncio.to_thread(self.bot.journal.compact)
+
+    async def edit_content(self, message:discord.Message, transform, filepath:str = None, **kwargs) -> None:
+        """
+        Edit the content of a clip's message.
+        Edits run one at a time and each one builds on the content the last one left, so they don't undo each other.
+
+        Parameters
+        ----------
+        message: :class:`discord.Message`
+            The message sent for the clip. Its content is kept up to date.
+        transform: Callable[[:class:`str`], :class:`str`]
+            Gets the current content and returns the new content.
+        filepath: Optional[:class:`str`]
+            If given, the message's buttons are pointed at this clip.
+        **kwargs
+            Passed to :meth:`discord.Message.edit`.
+        """
+        async with self._edit_lock:
+            content = transform(message.content)
+            if filepath is not None:
+                kwargs["view"] = DynamicUploadView(filepath=filepath, message=content)
+            await message.edit(content=content, **kwargs)
+            message.content = content
+
+    async def attach_health(self, message:discord.Message, end:float, sample:asyncio.Task) -> None:
+        """
+        Add the dropped frames during a clip to its message, once OBS has been sampled for its save.
+
+        Parameters
+        ----------
+        message: :class:`discord.Message`
+            The message sent for the clip.
+        end: :class:`float`
+            The time the clip was saved as a UNIX timestamp.
+        sample: :class:`asyncio.Task`
+            The sample taken when the clip was saved, from :meth:`sample_health`.
+        """
+        if await sample is None:
+            return
+        health_str = self.get_health_str(end)
+        if not health_str:
+            return
+        try:
+            await self.edit_content(message, lambda content: content + health_str)
+        except Exception as e:
+            log.error(f"Error adding dropped frames to message: {e}")
+
+    async def attach_preview(self, message:discord.Message, clip_path:str) -> None:
+        """
+        Make a preview of a clip and attach it to the clip's message.
+
+        Parameters
+        ----------
+        message: :class:`discord.Message`
+            The message sent for the clip.
+        clip_path: :class:`str`
+            The full path to the clip.
+        """
+        if not os.path.exists(clip_path):
+            return
+        path = await self.previews.preview(clip_path)
+        if path is None:
+            return
+        try:
+            await message.edit(attachments=[discord.File(path, filename="preview.jpg")])
+            log.info(f"Attached preview to message {message.id}")
+        except Exception as e:
+            log.error(f"Error attaching preview: {e}")
+
+    async def remux_replay(self, message, event:dict, last:dict = None) -> None:
+        """
+        Remux a replay and, if it's the replay the next one may be merged into, point it at the mp4.
+
+        Parameters
+        ----------
+        message: Optional[:class:`discord.Message`]
+            The message sent for the replay.
+        event: :class:`dict`
+            The journal event of the replay.
+        last: Optional[:class:`dict`]
+            The replay from :meth:`track_replay`.
+        """
+        mp4_path = await self.remux_clip(message, event["remux_path"], event["size"])
+        # Set by the task itself, so a merge that waited for it merges the mp4
+        if last is not None and mp4_path is not None:
+            last["path"] = mp4_path
+
+    async def remux_clip(self, message, mkv_path:str, file_size:float) -> None:
+        """
+        Remux a replay and point its message at the mp4.
+
+        Parameters
+        ----------
+        message: Optional[:class:`discord.Message`]
+            The message sent for the replay.
+        mkv_path: :class:`str`
+            The full path to the mkv.
+        file_size: :class:`float`
+            The size of the mkv in MB, as shown in the message.
+
+        Returns
+        -------
+        Optional[:class:`str`]
+            The path to the mp4, or ``None`` if the remux failed.
+        """
+        mp4_path = await self.remuxer.remux(mkv_path)
+        if mp4_path is None:
+            log.warning(f"Could not remux {mkv_path}, keeping the mkv.")
+            return None
+        if message is None:
+            return mp4_path
+        old_name, new_name = os.path.basename(mkv_path), os.path.basename(mp4_path)
+        new_size = round(os.path.getsize(mp4_path) / (1024 * 1024), 2)
+        try:
+            await self.edit_content(message, lambda content: content.replace(f"`{old_name}` ({file_size} MB)", f"`{new_name}` ({new_size} MB)"), filepath=new_name)
+            log.info(f"Updated message {message.id} with remuxed clip: {new_name}")
+        except Exception as e:
+            log.error(f"Error updating message with remuxed clip: {e}")
+        return mp4_path
+
+    async def notify_discord(self, filepath:str, file_size:float, context:dict = None):
         """
         Send a message to Discord when a replay buffer is saved.
         
@@ -138,9 +599,19 @@ class Observer:
             The path to the saved replay buffer file.
         file_size: :class:`float`
             The size of the saved replay buffer file in MB.
+        context: Optional[:class:`dict`]
+            The context of the replay from :meth:`get_context`. Defaults to the current context.
+
+        Returns
+        -------
+        Optional[:class:`discord.Message`]
+            The message that was sent, if any.
         """
+        message = None
         try:
-            active_window = get_frontmost_window_title()
+            if context is None:
+                context = self.get_context()
+            active_window = context["window"]
             channel = self.bot.get_channel(self.bot.CLIPS_CHANNEL.id)
             # Get time from the file name 
             # Example: Replay_2025-04-06_18-05-52.mp4
@@ -151,31 +622,81 @@ class Observer:
 
             timestamp_str = f"<t:{int(time_str.timestamp())}:f>"
 
-            # Get members from the VC_USERS list
-            if self.bot.RECORD_USERS:
-                members = [f"<@{user.id}>" for user in self.bot.VC_USERS]
-                members_str = ", ".join(members)
-                members_str_name = ", ".join([user.name for user in self.bot.VC_USERS])
+            # Get members from the VC_USERS list at the time of the replay
+            if context["members"]:
+                members_str = ", ".join([f"<@{user_id}>" for user_id, _ in context["members"]])
+                members_str_name = ", ".join([name for _, name in context["members"]])
             else:
                 members_str = "No users"
                 members_str_name = "No users"
             log.info(f"Members in VC: {members_str_name}")
         except Exception as e:
             log.error(f"Error getting members in VC: {e}")
-            return 
+            return None
         if channel:
             try:
                 view = DynamicUploadView(
                     filepath=filepath, 
                     message=f"Replay saved!\nPeople in VC: {members_str}\nActive window: {active_window}\nFile info: `{filepath}` ({file_size} MB)"
                 )
-                await channel.send(f"Replay saved! ({timestamp_str})\nPeople in VC: {members_str}\nActive window: {active_window}\nFile info: `{filepath}` ({file_size} MB)", view=view)
+                message = await channel.send(f"Replay saved! ({timestamp_str})\nPeople in VC: {members_str}\nActive window: {active_window}\nFile info: `{filepath}` ({file_size} MB)", view=view)
             except Exception as e:
                 log.error(f"Error sending message to Discord: {e}")
-                await channel.send(f"Replay saved! People in VC: {members_str}\nFile info: `{filepath}` ({file_size} MB)\nError: {e}")
+                message = await channel.send(f"Replay saved! People in VC: {members_str}\nFile info: `{filepath}` ({file_size} MB)\nError: {e}")
             log.info(f"Sent message to Discord channel: {channel.name}")
         else:
             log.warning("Could not find Discord channel.")
+        self.record_stats(filepath, file_size, context, channel)
+        return message
+
+    def get_health_str(self, end:float) -> str:
+        """
+        Get a line with the dropped frames during a clip, if the health monitor has samples from before and after it.
+
+        Parameters
+        ----------
+        end: :class:`float`
+            The time the clip was saved as a UNIX timestamp.
+
+        Returns
+        -------
+        :class:`str`
+            The line (starting with a newline), or an empty string if the samples don't cover the clip.
+        """
+        if self.health is None:
+            return ""
+        dropped = self.health.dropped_frames(end - config.replay_buffer_length, end)
+        if dropped is None:
+            return ""
+        return f"\nDropped frames: {dropped}%" + (" :warning:" if dropped > self.health.MAX_DROPPED_PERCENT else "")
+
+    def record_stats(self, filepath:str, file_size:float, context:dict, channel) -> None:
+        """
+        Count a saved clip in the bot's clip stats.
+
+        Parameters
+        ----------
+        filepath: :class:`str`
+            The file name of the saved clip.
+        file_size: :class:`float`
+            The size of the saved clip in MB, used if the file can't be read.
+        context: :class:`dict`
+            The context of the clip from :meth:`get_context`.
+        channel: Optional[:class:`discord.TextChannel`]
+            The clips channel, used for the guild when the main user isn't in VC.
+        """
+        try:
+            size = os.path.getsize(os.path.join(config.clips_path, filepath))
+        except OSError:
+            size = int(file_size * 1024 * 1024)
+        guild_id = context["guild"]
+        if guild_id is None and channel:
+            guild_id = channel.guild.id
+        people = [user_id for user_id, _ in context["members"]]
+        try:
+            self.bot.clip_stats.record_save(filepath, size, context["window"], people, guild_id)
+        except Exception as e:
+            log.error(f"Error recording clip stats: {e}")
 
     def on_input_mute_state_changed(self, data) -> None:
         """
@@ -251,6 +772,8 @@ class Observer:
         """
         Disconnect from the OBS WebSocket server.
         """
+        if self.health is not None:
+            self.health.stop()
         if self._client:
             self._client.disconnect()
             self.running = False
@@ -263,8 +786,15 @@ class Observer:
         Run the observer in an async-friendly way.
         """
         # Connect to the OBS WebSocket server
-        if self._client is None:
+        if not self.local:
+            self.running = True
+        elif self._client is None:
             self.connect()
+        # on_ready runs again after every gateway reconnect, so only start what isn't running already
+        if self.health is not None and (self._health_task is None or self._health_task.done()):
+            self._health_task = asyncio.create_task(self.health.run())
+        if self._journal_task is None or self._journal_task.done():
+            self._journal_task = asyncio.create_task(self.maintain_journal())
         # Start the event loop
         # log.info("Started OBS WebSocket client.")
         while self.running:
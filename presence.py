@@ -0,0 +1,142 @@
+import os
+import discord
+import logging
+import asyncio
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;82;1mBot\u001b[0m")
+
+
+class VoiceTracker:
+    """
+    Tracks who is in VC with the main user, so each clip can say who was there.
+    Mixed into :class:`OBSClipper`, which sets up ``MY_ID``, ``RECORD_USERS``, ``RECORD_USERS_CHANNEL``, ``VC_USERS`` and ``pending_removals``.
+    ``VC_USERS`` and ``pending_removals`` are keyed by member ID.
+    """
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        if before.channel == after.channel:
+            return  # Muted, deafened, streaming, etc.
+        # Moving between channels is leaving one and joining the other
+        if before.channel is not None:
+            self.voice_channel_left(member, before.channel)
+        if after.channel is not None:
+            self.voice_channel_joined(member, after.channel)
+
+    def voice_channel_joined(self, member: discord.Member, channel):
+        if member.id == self.MY_ID.id: # Main user joined a voice channel
+            if member.id in self.pending_removals:
+                log.info(f"Cancelled removal of {member.name} (Main user) from VC_USERS")
+            # VC_USERS is rebuilt from the channel, so nobody's pending removal applies anymore
+            for task in self.pending_removals.values():
+                task.cancel()
+            self.pending_removals.clear()
+
+            log.info(f"Main user joined {channel.name}, START RECORDING PEOPLE!")
+            self.RECORD_USERS = True
+            self.RECORD_USERS_CHANNEL = channel
+            self.VC_USERS = {user.id: user for user in channel.members}
+            log.info(f"VC_USERS updated: {[user.name for user in self.VC_USERS.values()]}")
+        else: # User joined a voice channel
+            if self.RECORD_USERS and self.RECORD_USERS_CHANNEL == channel:
+                log.info(f"{member.name} joined {channel.name}")
+                if member.id in self.pending_removals:
+                    # Cancel pending removal if they rejoin within 30 seconds
+                    self.pending_removals.pop(member.id).cancel()
+                    log.info(f"Cancelled removal of {member.name} from VC_USERS")
+                if member.id not in self.VC_USERS:
+                    log.info(f"Added {member.name} to VC_USERS")
+                    self.VC_USERS[member.id] = member
+
+    def voice_channel_left(self, member: discord.Member, channel):
+        if member.id == self.MY_ID.id:
+            log.info(f"Ovlic left {channel.name}, starting delay...")
+            task = asyncio.create_task(self.delayed_main_user_leave(member))
+            self.pending_removals[member.id] = task
+        else:
+            if self.RECORD_USERS and self.RECORD_USERS_CHANNEL == channel:
+                log.info(f"{member.name} left {channel.name}, scheduling removal in 30 seconds.")
+                if member.id in self.VC_USERS:
+                    task = asyncio.create_task(self.delayed_removal(member))
+                    self.pending_removals[member.id] = task
+
+    async def delayed_removal(self, member):
+        """
+        Wait for 30 seconds before removing the user from VC_USERS.
+        This is to prevent removing users who rejoin within 30 seconds.
+        
+        Parameters
+        ----------
+        member: :class:`discord.Member`
+            The member to remove.
+        """
+        await asyncio.sleep(30)
+        if self.VC_USERS.pop(member.id, None) is not None:
+            log.info(f"Removed {member.name} from VC_USERS after delay.")
+        self.pending_removals.pop(member.id, None)
+
+    async def delayed_main_user_leave(self, member):
+        """
+        Wait for 30 seconds before stopping recording.
+        This is to prevent stopping recording if the main user rejoin within 30 seconds.
+        
+        Parameters
+        ----------
+        member: :class:`discord.Member`
+            The main user to check.
+        """
+        await asyncio.sleep(30)
+        self.pending_removals.pop(member.id, None)
+        if member.id in self.VC_USERS:
+            log.info(f"Ovlic has left the channel, stopping recording.")
+            # Stop recording, nobody is left to remove
+            for task in self.pending_removals.values():
+                task.cancel()
+            self.pending_removals.clear()
+            self.RECORD_USERS = False
+            self.RECORD_USERS_CHANNEL = None
+            self.VC_USERS = {}
+            log.info(f"Stopped recording, VC_USERS cleared.")
+            ac = await self.attach_clips()
+            if ac == -1:
+                log.error("Failed to attach clips.")
+        else:
+            log.warning("Main user not in VC_USERS, not stopping recording. (Was already in VC when bot started?)")
+
+    async def attach_clips(self):
+        """Attach captured replay files to their original messages."""
+        log.info("Attaching clips to messages...")
+        if not self.CLIP_MESSAGES:
+            log.info("No clips to attach.")
+            return
+
+        channel = self.get_channel(self.CLIPS_CHANNEL.id)
+        if not channel:
+            log.error("Clips channel not found!")
+            return -1
+
+        log.info(f"Amount of clips to attach: {len(self.CLIP_MESSAGES)}")
+        to_remove = []  # Store successful message IDs for removal
+
+        for message_id, filepath in self.CLIP_MESSAGES[:]:  # Iterate over a copy
+            log.debug(f"Attaching clip to message {message_id}: {filepath}")
+            if os.path.exists(filepath):
+                try:
+                    msg = await channel.fetch_message(message_id)
+                    file = discord.File(filepath, filename=os.path.basename(filepath))
+
+                    # Preserve existing attachments
+                    new_attachments = msg.attachments + [file]
+
+                    await msg.edit(content=msg.content + "\n[Clip attached]", attachments=new_attachments)
+                    log.info(f"Edited message {message_id} with clip: {filepath}")
+
+                    to_remove.append((message_id, filepath))  # Mark for removal
+                except Exception as e:
+                    log.error(f"Failed to edit message {message_id}: {e}")
+            else:
+                log.warning(f"File not found: {filepath}")
+
+        # Remove processed messages after iteration
+        for item in to_remove:
+            self.CLIP_MESSAGES.remove(item)
+
+        log.info("Finished attaching clips.")
@@ -0,0 +1,316 @@
+"""
+A deterministic load simulator for the voice tracking in :class:`presence.VoiceTracker`.
+
+Synthetic joins, leaves, moves and rejoins within the grace period are fed to the tracker across many channels on a virtual clock,
+so a run is the same every time and the 30 second delays take no real time. Tracked membership is checked against the simulated world as it goes.
+
+Run it with: python presence_sim.py [members] [channels] [events] [seed]
+"""
+import sys, time, random, asyncio, logging, selectors
+from typing import Optional
+from presence import VoiceTracker
+
+# How long a member who left stays tracked, matching the tracker's delays
+GRACE_PERIOD = 30
+# Timers that fire this close to a check may or may not have run yet
+TOLERANCE = 1e-6
+
+
+class VirtualClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+
+class _VirtualSelector(selectors.SelectSelector):
+    def __init__(self, clock:VirtualClock) -> None:
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        # The loop only waits when nothing is ready, so skip straight to the next timer
+        if timeout:
+            self.clock.now += timeout
+        return super().select(0)
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    """
+    An event loop whose clock only moves when every task is waiting on a timer.
+    """
+    def __init__(self) -> None:
+        self.clock = VirtualClock()
+        super().__init__(_VirtualSelector(self.clock))
+
+    def time(self) -> float:
+        return self.clock.now
+
+
+class Member:
+    """
+    A stand-in for :class:`discord.Member`, which is also compared and hashed by ID.
+    """
+    __slots__ = ("id", "name")
+
+    def __init__(self, id:int, name:str) -> None:
+        self.id = id
+        self.name = name
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Member) and other.id == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+
+class Guild:
+    def __init__(self, id:int) -> None:
+        self.id = id
+
+
+class Channel:
+    """
+    A stand-in for :class:`discord.VoiceChannel`.
+    """
+    def __init__(self, id:int, guild:Guild) -> None:
+        self.id = id
+        self.name = f"vc-{id}"
+        self.guild = guild
+        self._members: dict[int, Member] = {}
+
+    @property
+    def members(self) -> list[Member]:
+        # Like discord.py, a new list every time
+        return list(self._members.values())
+
+
+class VoiceState:
+    def __init__(self, channel:Optional[Channel]) -> None:
+        self.channel = channel
+
+
+class SimTracker(VoiceTracker):
+    """
+    The voice tracker with the state :class:`OBSClipper` gives it, without Discord or OBS.
+    """
+    def __init__(self, main:Member) -> None:
+        self.MY_ID = main
+        self.RECORD_USERS = False
+        self.RECORD_USERS_CHANNEL = None
+        self.VC_USERS = {}
+        self.pending_removals = {}
+        # No clips are sent, so attaching them when the main user leaves has nothing to do
+        self.CLIP_MESSAGES = []
+
+
+class Simulation:
+    """
+    Generates voice events, feeds them to a :class:`SimTracker` and checks it after each one.
+    """
+    def __init__(self, members:int = 1000, channels:int = 50, events:int = 100_000, seed:int = 0, rate:float = 50.0, check_every:int = 1) -> None:
+        """
+        Parameters
+        ----------
+        members: :class:`int`
+            The number of members besides the main user.
+        channels: :class:`int`
+            The number of voice channels.
+        events: :class:`int`
+            The number of voice events to generate.
+        seed: :class:`int`
+            The seed of the random events.
+        rate: :class:`float`
+            The average number of events per virtual second.
+        check_every: :class:`int`
+            Check the tracker after this many events.
+        """
+        self.rng = random.Random(seed)
+        self.events = events
+        self.rate = rate
+        self.check_every = check_every
+        guild = Guild(1)
+        self.channels = [Channel(i, guild) for i in range(channels)]
+        self.main = Member(0, "main")
+        self.members = [self.main] + [Member(i, f"member{i}") for i in range(1, members + 1)]
+        self.where: dict[int, Channel] = {}  # Member ID -> channel they're in
+        self.left: dict[int, tuple[Channel, float]] = {}  # Member ID -> channel they last left and when
+        self.left_at: dict[tuple[int, int], float] = {}  # (member ID, channel ID) -> when they last left
+        self.tracker = SimTracker(self.main)
+        self.cpu: list[int] = []  # Nanoseconds of CPU time per event
+        self.violations: dict[str, int] = {}
+        self.examples: dict[str, str] = {}  # The first violation of each kind
+        self.tasks = 0
+        self.peak_tasks = 0
+        self.peak_pending = 0
+        self.peak_tracked = 0
+
+    def _task_factory(self, loop, coro, **kwargs):
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        self.tasks += 1
+        self.peak_tasks = max(self.peak_tasks, self.tasks)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task:asyncio.Task) -> None:
+        self.tasks -= 1
+        # The tracker never awaits its tasks, so errors in them would otherwise go unnoticed
+        if not task.cancelled() and task.exception() is not None:
+            self._violation("task error", repr(task.exception()))
+
+    def _violation(self, kind:str, detail:str) -> None:
+        self.violations[kind] = self.violations.get(kind, 0) + 1
+        self.examples.setdefault(kind, f"t={self.loop.time():.3f}s {kind}: {detail}")
+
+    def next_event(self) -> tuple[Member, Optional[Channel], Optional[Channel]]:
+        """
+        Pick the next event and apply it to the world.
+
+        Returns
+        -------
+        :class:`tuple`
+            The member, the channel they were in and the channel they're in now.
+        """
+        rng = self.rng
+        now = self.loop.time()
+        # The main user moves around much less than everyone else combined, and is sometimes gone for longer than the grace period
+        member = self.main if rng.random() < (0.002 if self.main.id in self.where else 0.0005) else rng.choice(self.members)
+        before = self.where.get(member.id)
+        main_channel = self.where.get(self.main.id)
+        if before is None:
+            left = self.left.get(member.id)
+            if left is not None and now - left[1] < GRACE_PERIOD and rng.random() < 0.5:
+                after = left[0]  # Rejoin within the grace period
+            elif main_channel is not None and rng.random() < 0.5:
+                after = main_channel
+            else:
+                after = rng.choice(self.channels)
+        elif rng.random() < 0.5:
+            after = None
+        else:
+            after = main_channel if main_channel is not None and main_channel is not before and rng.random() < 0.5 else rng.choice(self.channels)
+            if after is before:
+                after = None
+
+        if before is not None:
+            del before._members[member.id]
+            del self.where[member.id]
+            self.left[member.id] = (before, now)
+            self.left_at[(member.id, before.id)] = now
+        if after is not None:
+            after._members[member.id] = member
+            self.where[member.id] = after
+        return member, before, after
+
+    def check(self) -> None:
+        """
+        Check the tracker's state against the world.
+        """
+        now = self.loop.time()
+        tracker = self.tracker
+        tracked = tracker.VC_USERS.keys()
+        self.peak_tracked = max(self.peak_tracked, len(tracked))
+        self.peak_pending = max(self.peak_pending, len(tracker.pending_removals))
+        wrong = sum(1 for member_id, member in tracker.VC_USERS.items() if member.id != member_id)
+        if wrong:
+            self._violation("wrong key", f"{wrong} members tracked under another member's ID")
+        leaked = sum(1 for task in tracker.pending_removals.values() if task.done())
+        if leaked:
+            self._violation("leaked removal", f"{leaked} finished removals still in pending_removals")
+
+        channel = self.where.get(self.main.id)
+        if channel is None:
+            left = self.left.get(self.main.id)
+            if left is None:
+                return
+            waited = now - left[1]
+            if abs(waited - GRACE_PERIOD) < TOLERANCE:
+                return
+            if waited > GRACE_PERIOD:
+                if tracker.RECORD_USERS or tracker.VC_USERS:
+                    self._violation("still recording", f"main user left {waited:.1f}s ago")
+                return
+            channel = left[0]
+        if not tracker.RECORD_USERS or tracker.RECORD_USERS_CHANNEL is not channel:
+            self._violation("wrong channel", f"recording {getattr(tracker.RECORD_USERS_CHANNEL, 'name', None)} instead of {channel.name}")
+            return
+        missing = channel._members.keys() - tracked
+        if missing:
+            self._violation("missing", f"{len(missing)} members in {channel.name} aren't tracked")
+        stale = 0
+        for member_id in tracked - channel._members.keys():
+            left = self.left_at.get((member_id, channel.id))
+            if left is None or now - left > GRACE_PERIOD + TOLERANCE:
+                stale += 1
+        if stale:
+            self._violation("stale", f"{stale} members tracked after leaving {channel.name} more than {GRACE_PERIOD}s ago")
+
+    async def _run(self) -> None:
+        on_voice_state_update = self.tracker.on_voice_state_update
+        for i in range(self.events):
+            await asyncio.sleep(self.rng.expovariate(self.rate))
+            member, before, after = self.next_event()
+            start = time.process_time_ns()
+            await on_voice_state_update(member, VoiceState(before), VoiceState(after))
+            self.cpu.append(time.process_time_ns() - start)
+            if i % self.check_every == 0:
+                self.check()
+        # Let every pending removal run out
+        await asyncio.sleep(GRACE_PERIOD + 1)
+        self.check()
+
+    def run(self) -> dict:
+        """
+        Run the simulation.
+
+        Returns
+        -------
+        :class:`dict`
+            The results, see :func:`report`.
+        """
+        self.loop = VirtualLoop()
+        self.loop.set_task_factory(self._task_factory)
+        start_cpu, start_wall = time.process_time(), time.perf_counter()
+        try:
+            self.loop.run_until_complete(self._run())
+        finally:
+            self.loop.close()
+        cpu = time.process_time() - start_cpu
+        per_event = sorted(self.cpu)
+        return {
+            "events": self.events,
+            "virtual_seconds": round(self.loop.clock.now, 1),
+            "wall_seconds": round(time.perf_counter() - start_wall, 2),
+            "cpu_seconds": round(cpu, 2),
+            "handler_events_per_second": round(self.events / (sum(per_event) / 1e9)),
+            "p50_us": round(per_event[len(per_event) // 2] / 1000, 2),
+            "p99_us": round(per_event[int(len(per_event) * 0.99)] / 1000, 2),
+            "max_us": round(per_event[-1] / 1000, 2),
+            "peak_tasks": self.peak_tasks,
+            "peak_pending_removals": self.peak_pending,
+            "peak_tracked": self.peak_tracked,
+            "violations": dict(self.violations),
+            "examples": list(self.examples.values()),
+        }
+
+
+def report(results:dict) -> str:
+    """
+    Format the results of a simulation.
+    """
+    lines = [
+        f"{results['events']} events over {results['virtual_seconds']} virtual seconds ({results['wall_seconds']}s wall, {results['cpu_seconds']}s CPU)",
+        f"Handler: {results['handler_events_per_second']} events/s, p50 {results['p50_us']}us, p99 {results['p99_us']}us, max {results['max_us']}us",
+        f"Peak tasks: {results['peak_tasks']}, peak pending removals: {results['peak_pending_removals']}, peak tracked members: {results['peak_tracked']}",
+    ]
+    if results["violations"]:
+        lines.append("Invariant violations: " + ", ".join(f"{kind}: {count}" for kind, count in results["violations"].items()))
+        lines += [f"  {example}" for example in results["examples"]]
+    else:
+        lines.append("No invariant violations.")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    args = [int(arg) for arg in sys.argv[1:5]]
+    members, channels, events, seed = args + [1000, 50, 100_000, 0][len(args):]
+    print(report(Simulation(members, channels, events, seed).run()))
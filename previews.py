@@ -0,0 +1,102 @@
+from __future__ import annotations
+import os, shutil, asyncio, logging
+from typing import Optional
+from config import config
+from remux import get_duration, low_priority_kwargs, low_priority_prefix
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;114;1mpreviews\u001b[0m")
+
+
+def preview_path(clip_path:str) -> str:
+    """
+    Get the path of a clip's preview image, which is cached next to the clip.
+    """
+    return os.path.splitext(clip_path)[0] + ".preview.jpg"
+
+
+class PreviewPool:
+    """
+    Makes a contact sheet of a few frames from each clip with ffmpeg.
+    ffmpeg runs in separate processes at a low priority, and only a few run at once.
+    """
+    FRAMES = 4
+    COLUMNS = 2
+    WIDTH = 480  # Width of each frame
+
+    def __init__(self, workers:int = 1) -> None:
+        """
+        Initialize the pool.
+
+        Parameters
+        ----------
+        workers: :class:`int`
+            The maximum number of previews made at once.
+        """
+        self._workers = asyncio.Semaphore(max(1, workers))
+        self._making: dict[str, asyncio.Task] = {}
+        # Checked once, so a missing ffmpeg is one warning instead of an error on every clip
+        self.available = shutil.which(config.ffmpeg_path) is not None
+        if not self.available:
+            log.warning(f"ffmpeg not found at {config.ffmpeg_path}, clip previews are off.")
+
+    def _command(self, clip_path:str, out_path:str, duration:float) -> list[str]:
+        cmd = low_priority_prefix() + [config.ffmpeg_path, "-nostdin", "-y", "-loglevel", "error"]
+        # Seeking before each input only decodes around the frames we need
+        for i in range(self.FRAMES):
+            cmd += ["-ss", f"{duration * (i + 0.5) / self.FRAMES:.3f}", "-i", clip_path]
+        filters = [f"[{i}:v]scale={self.WIDTH}:-2,setsar=1[f{i}]" for i in range(self.FRAMES)]
+        rows = []
+        for row in range(0, self.FRAMES, self.COLUMNS):
+            inputs = "".join(f"[f{i}]" for i in range(row, min(row + self.COLUMNS, self.FRAMES)))
+            count = min(self.COLUMNS, self.FRAMES - row)
+            filters.append(f"{inputs}hstack=inputs={count}[r{len(rows)}]" if count > 1 else f"{inputs}copy[r{len(rows)}]")
+            rows.append(f"[r{len(rows)}]")
+        filters.append(f"{''.join(rows)}vstack=inputs={len(rows)}[out]" if len(rows) > 1 else f"{rows[0]}copy[out]")
+        return cmd + ["-filter_complex", ";".join(filters), "-map", "[out]", "-frames:v", "1", "-q:v", "4", out_path]
+
+    async def preview(self, clip_path:str) -> Optional[str]:
+        """
+        Get the preview of a clip, making it if it isn't cached.
+
+        Parameters
+        ----------
+        clip_path: :class:`str`
+            The path to the clip.
+
+        Returns
+        -------
+        Optional[:class:`str`]
+            The path to the preview image, or ``None`` if it couldn't be made.
+        """
+        out_path = preview_path(clip_path)
+        if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(clip_path):
+            return out_path
+        # Share one ffmpeg run between everyone asking for the same preview
+        if clip_path not in self._making:
+            task = asyncio.create_task(self._make(clip_path, out_path))
+            self._making[clip_path] = task
+            task.add_done_callback(lambda _: self._making.pop(clip_path, None))
+        return await asyncio.shield(self._making[clip_path])
+
+    async def _make(self, clip_path:str, out_path:str) -> Optional[str]:
+        async with self._workers:
+            # Replays are never longer than the replay buffer
+            duration = await get_duration(clip_path) or config.replay_buffer_length
+            tmp_path = out_path[:-4] + ".part.jpg"  # ffmpeg picks the format from the extension
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *self._command(clip_path, tmp_path, duration),
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE, **low_priority_kwargs()
+                )
+            except OSError as e:
+                log.error(f"Could not start ffmpeg: {e}")
+                return None
+            _, stderr = await proc.communicate()
+        if proc.returncode != 0 or not os.path.exists(tmp_path):
+            log.error(f"ffmpeg failed to make a preview of {clip_path}: {stderr.decode(errors='replace').strip()}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, out_path)
+        log.info(f"Made preview of {os.path.basename(clip_path)}")
+        return out_path
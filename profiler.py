@@ -0,0 +1,171 @@
+from __future__ import annotations
+import io, sys, time, marshal, asyncio, logging, threading, cProfile, pstats, tracemalloc
+from collections import Counter
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;201;1mprofiler\u001b[0m")
+
+PROFILE_MODES = ("cpu", "mem", "loop")
+
+# Only one capture can run at a time, nothing is installed while it's idle
+_lock = asyncio.Lock()
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples the stacks of every thread and counts them in folded (flame graph) format.
+    """
+    def __init__(self, interval: float = 0.005) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename.split('/')[-1]}:{frame.f_code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> str:
+        self._stop_event.set()
+        self.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+async def _profile_cpu(seconds: int, top: int) -> tuple[str, list[tuple[str, bytes]]]:
+    profiler = cProfile.Profile()
+    sampler = _StackSampler()
+    sampler.start()
+    profiler.enable()  # Only sees the event loop thread, the sampler covers the rest
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        folded = sampler.stop()
+
+    text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=text)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    profiler.create_stats()
+    # pstats can only dump to a path, so marshal the stats the same way it does
+    files = [
+        ("profile.pstats", marshal.dumps(profiler.stats)),
+        ("profile.txt", text.getvalue().encode()),
+        ("flamegraph.folded", folded.encode()),
+    ]
+    return f"CPU profile of {seconds}s ({sum(sampler.stacks.values())} stack samples)", files
+
+
+async def _profile_mem(seconds: int, top: int) -> tuple[str, list[tuple[str, bytes]]]:
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(25)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    lines = [f"Traced memory: {round(current / (1024 * 1024), 2)} MB (peak {round(peak / (1024 * 1024), 2)} MB)", "", f"Top {top} growth over {seconds}s:"]
+    lines += [str(stat) for stat in after.compare_to(before, "lineno")[:top]]
+    lines += ["", f"Top {top} allocations:"]
+    lines += [str(stat) for stat in after.statistics("lineno")[:top]]
+    return f"Memory profile of {seconds}s", [("tracemalloc.txt", "\n".join(lines).encode())]
+
+
+class _SlowCallbackHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.records: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if "Executing" in record.getMessage():
+            self.records.append(record.getMessage())
+
+
+async def _profile_loop(seconds: int, top: int, interval: float = 0.05, slow_callback: float = 0.1) -> tuple[str, list[tuple[str, bytes]]]:
+    loop = asyncio.get_running_loop()
+    handler = _SlowCallbackHandler()
+    asyncio_log = logging.getLogger("asyncio")
+    old_debug, old_slow = loop.get_debug(), loop.slow_callback_duration
+    asyncio_log.addHandler(handler)
+    loop.set_debug(True)
+    loop.slow_callback_duration = slow_callback
+    lags = []
+    try:
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+    finally:
+        loop.set_debug(old_debug)
+        loop.slow_callback_duration = old_slow
+        asyncio_log.removeHandler(handler)
+
+    ordered = sorted(lags)
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000 if ordered else 0.0
+    lines = [
+        f"Loop lag over {seconds}s ({len(lags)} samples every {int(interval * 1000)} ms)",
+        f"p50: {percentile(0.5):.2f} ms, p99: {percentile(0.99):.2f} ms, max: {percentile(1.0):.2f} ms",
+        "",
+        f"Slow callbacks (> {int(slow_callback * 1000)} ms): {len(handler.records)}",
+    ]
+    lines += handler.records[:top]
+    lines += ["", "Samples (ms):"] + [f"{lag * 1000:.3f}" for lag in lags]
+    return f"Loop lag p99 {percentile(0.99):.2f} ms, {len(handler.records)} slow callbacks", [("loop.txt", "\n".join(lines).encode())]
+
+
+async def capture(seconds: int, mode: str, top: int = 30) -> tuple[str, list[tuple[str, bytes]]]:
+    """
+    Profile the running bot for a number of seconds.
+
+    Parameters
+    ----------
+    seconds: :class:`int`
+        How long to profile for.
+    mode: :class:`str`
+        One of ``cpu`` (cProfile and a stack sampler), ``mem`` (tracemalloc) or ``loop`` (event loop lag and slow callbacks).
+    top: :class:`int`
+        How many entries to include in the text reports.
+
+    Returns
+    -------
+    :class:`tuple[str, list[tuple[str, bytes]]]`
+        A summary and a list of (file name, contents) reports.
+
+    Raises
+    ------
+    ValueError
+        The mode is unknown.
+    RuntimeError
+        A profile is already running.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    if _lock.locked():
+        raise RuntimeError("A profile is already running.")
+    async with _lock:
+        log.info(f"Starting {mode} profile for {seconds}s")
+        if mode == "cpu":
+            result = await _profile_cpu(seconds, top)
+        elif mode == "mem":
+            result = await _profile_mem(seconds, top)
+        else:
+            result = await _profile_loop(seconds, top)
+        log.info(f"Finished {mode} profile")
+        return result
@@ -0,0 +1,514 @@
+from __future__ import annotations
+import os, hmac, json, struct, asyncio, hashlib, logging, secrets, itertools
+from collections import deque
+from typing import Callable, Optional
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;75;1mremote\u001b[0m")
+
+# Frames are a 4 byte header length, a JSON header and an optional payload of header["len"] bytes
+HEADER = struct.Struct("!I")
+MAX_HEADER = 64 * 1024
+CHUNK_SIZE = 256 * 1024
+
+
+async def read_frame(reader:asyncio.StreamReader) -> tuple[dict, bytes]:
+    """
+    Read one frame.
+
+    Returns
+    -------
+    :class:`tuple[dict, bytes]`
+        The header and the payload.
+
+    Raises
+    ------
+    asyncio.IncompleteReadError
+        The connection closed.
+    ValueError
+        The frame is malformed.
+    """
+    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if size > MAX_HEADER:
+        raise ValueError(f"Frame header too large: {size}")
+    header = json.loads(await reader.readexactly(size))
+    payload = await reader.readexactly(header["len"]) if header.get("len") else b""
+    return header, payload
+
+
+async def write_frame(writer:asyncio.StreamWriter, header:dict, payload:bytes = b"") -> None:
+    """
+    Write one frame and wait until the other side has room for more.
+    """
+    if payload:
+        header["len"] = len(payload)
+    data = json.dumps(header).encode()
+    writer.write(HEADER.pack(len(data)) + data)
+    if payload:
+        writer.write(payload)
+    await writer.drain()
+
+
+def parse_address(address:str) -> tuple[Optional[str], Optional[int], Optional[str]]:
+    """
+    Parse an address like ``host:port`` or ``unix:/path/to/socket``.
+
+    Returns
+    -------
+    :class:`tuple`
+        The host, port and unix socket path. Either the host and port or the path is ``None``.
+    """
+    if address.startswith("unix:"):
+        return None, None, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return host, int(port), None
+
+
+async def open_connection(address:str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    host, port, path = parse_address(address)
+    if path is not None:
+        return await asyncio.open_unix_connection(path)
+    return await asyncio.open_connection(host, port)
+
+
+async def start_server(callback, address:str) -> asyncio.AbstractServer:
+    host, port, path = parse_address(address)
+    if path is not None:
+        if os.path.exists(path):
+            os.remove(path)  # Left over from a previous run
+        return await asyncio.start_unix_server(callback, path)
+    return await asyncio.start_server(callback, host, port)
+
+
+def sign_nonce(secret:str, nonce:str) -> str:
+    return hmac.new(secret.encode(), nonce.encode(), hashlib.sha256).hexdigest()
+
+
+def check_secret(secret:Optional[str]) -> None:
+    """
+    Make sure there's a secret, since without one anyone who can reach the hub could pose as an agent.
+
+    Raises
+    ------
+    ValueError
+        The secret is empty.
+    """
+    if not secret:
+        raise ValueError("hub_secret must be set for the hub and its agents")
+
+
+def hash_file(path:str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AgentClient:
+    """
+    The network side of a capture agent. Forwards replay events to a hub and sends clip files when the hub asks for them.
+    """
+    def __init__(self, name:str, address:str, secret:str, clips_path:str) -> None:
+        """
+        Initialize the client.
+
+        Parameters
+        ----------
+        name: :class:`str`
+            The name of this agent, shown by the hub.
+        address: :class:`str`
+            The address of the hub, like ``host:port`` or ``unix:/path/to/socket``.
+        secret: :class:`str`
+            The secret shared with the hub.
+        clips_path: :class:`str`
+            The path to the clips folder on this machine.
+
+        Raises
+        ------
+        ValueError
+            The secret is empty.
+        """
+        check_secret(secret)
+        self.name = name
+        self.address = address
+        self.secret = secret
+        self.clips_path = clips_path
+        self.running = False
+        self.connected = asyncio.Event()
+        self._unacked: deque[dict] = deque()  # Replay events the hub hasn't acknowledged yet
+        self._writer: asyncio.StreamWriter = None
+
+    async def send_replay(self, event:dict) -> None:
+        """
+        Forward a replay event. It's kept and resent until the hub acknowledges it.
+
+        Parameters
+        ----------
+        event: :class:`dict`
+            The event, with at least the ``file`` name.
+        """
+        self._unacked.append(event)
+        if self.connected.is_set():
+            try:
+                await write_frame(self._writer, {"type": "replay", "event": event})
+            except (ConnectionError, OSError) as e:
+                log.warning(f"Could not forward {event['file']}, will resend: {e}")
+
+    async def _send_file(self, writer:asyncio.StreamWriter, request_id:int, file_name:str, offset:int) -> None:
+        try:
+            await self._stream_file(writer, request_id, file_name, offset)
+        except asyncio.CancelledError:
+            log.info(f"Stopped sending {file_name}")
+            raise
+        except (ConnectionError, OSError) as e:
+            log.warning(f"Sending {file_name} was interrupted: {e}")
+
+    @staticmethod
+    def _hash_prefix(f, digest, size:int) -> None:
+        while size > 0:
+            chunk = f.read(min(size, 1024 * 1024))
+            if not chunk:
+                break
+            digest.update(chunk)
+            size -= len(chunk)
+
+    @staticmethod
+    def _read_chunk(f, digest) -> bytes:
+        chunk = f.read(CHUNK_SIZE)
+        digest.update(chunk)
+        return chunk
+
+    async def _stream_file(self, writer:asyncio.StreamWriter, request_id:int, file_name:str, offset:int) -> None:
+        path = os.path.join(self.clips_path, os.path.basename(file_name))
+        if not os.path.isfile(path):
+            await write_frame(writer, {"type": "error", "id": request_id, "error": "File not found"})
+            return
+        log.info(f"Sending {file_name} from byte {offset}")
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            # The checksum covers the whole file, including what the hub already has.
+            # Reading and hashing run in a thread so forwarding events isn't held up by large clips.
+            await asyncio.to_thread(self._hash_prefix, f, digest, offset)
+            while chunk := await asyncio.to_thread(self._read_chunk, f, digest):
+                # write_frame waits for the hub to drain, so a slow hub slows us down instead of filling memory
+                await write_frame(writer, {"type": "chunk", "id": request_id, "offset": offset}, chunk)
+                offset += len(chunk)
+        await write_frame(writer, {"type": "end", "id": request_id, "size": offset, "sha256": digest.hexdigest()})
+        log.info(f"Sent {file_name} ({offset} bytes)")
+
+    async def _session(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        header, _ = await read_frame(reader)
+        if header.get("type") != "challenge":
+            raise ValueError("Hub didn't send a challenge")
+        await write_frame(writer, {"type": "hello", "agent": self.name, "signature": sign_nonce(self.secret, header["nonce"])})
+        header, _ = await read_frame(reader)
+        if header.get("type") != "welcome":
+            raise PermissionError("Hub rejected this agent, check the secret")
+        self._writer = writer
+        self.connected.set()
+        log.info(f"Connected to hub at {self.address}")
+        for event in list(self._unacked):
+            await write_frame(writer, {"type": "replay", "event": event})
+
+        transfers: dict[int, asyncio.Task] = {}  # Request ID -> task sending the file
+        try:
+            while True:
+                header, _ = await read_frame(reader)
+                if header["type"] == "ack":
+                    for event in list(self._unacked):
+                        if event["file"] == header["file"]:
+                            self._unacked.remove(event)
+                elif header["type"] == "fetch":
+                    request_id = header["id"]
+                    task = asyncio.create_task(self._send_file(writer, request_id, header["file"], header.get("offset", 0)))
+                    transfers[request_id] = task
+                    task.add_done_callback(lambda _, request_id=request_id: transfers.pop(request_id, None))
+                elif header["type"] == "cancel":
+                    # The hub gave up on this transfer, so stop sending chunks it would throw away
+                    task = transfers.get(header["id"])
+                    if task is not None:
+                        task.cancel()
+        finally:
+            for task in list(transfers.values()):
+                task.cancel()
+
+    async def run(self) -> None:
+        """
+        Stay connected to the hub, reconnecting with a backoff until :meth:`stop` is called.
+        """
+        self.running = True
+        delay = 1
+        while self.running:
+            try:
+                reader, writer = await open_connection(self.address)
+            except OSError as e:
+                log.warning(f"Could not connect to hub at {self.address}, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            try:
+                await self._session(reader, writer)
+            except PermissionError as e:
+                log.error(str(e))
+            except (asyncio.IncompleteReadError, ConnectionError, OSError, ValueError) as e:
+                log.warning(f"Lost connection to hub: {e!r}")
+            finally:
+                if self.connected.is_set():
+                    delay = 1  # Only back off while connections keep failing
+                self.connected.clear()
+                self._writer = None
+                writer.close()
+            if self.running:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    def stop(self) -> None:
+        self.running = False
+        if self._writer is not None:
+            self._writer.close()
+
+
+class _AgentConnection:
+    def __init__(self, name:str, writer:asyncio.StreamWriter) -> None:
+        self.name = name
+        self.writer = writer
+        self.transfers: dict[int, _Transfer] = {}
+
+
+class _Transfer:
+    def __init__(self, file_name:str, part_path:str, future:asyncio.Future) -> None:
+        self.file_name = file_name
+        self.part_path = part_path
+        self.future = future
+        self.file = open(part_path, "ab")
+        self.received = 0  # Bytes received, to tell a slow transfer from a stalled one
+
+    def fail(self, error:Exception) -> None:
+        self.file.close()
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class ClipHub:
+    """
+    Accepts connections from capture agents, passes their replay events on and fetches clip files from them only when they're needed.
+    Fetched files are stored in the clips folder. Interrupted transfers are resumed from where they stopped.
+    """
+    FETCH_ATTEMPTS = 3
+    RECONNECT_TIMEOUT = 15
+    # How long a transfer may go without receiving anything before it's retried
+    STALL_TIMEOUT = 20
+
+    def __init__(self, address:str, secret:str, clips_path:str, on_replay:Callable[[str, dict], None]) -> None:
+        """
+        Initialize the hub.
+
+        Parameters
+        ----------
+        address: :class:`str`
+            The address to listen on, like ``host:port`` or ``unix:/path/to/socket``.
+        secret: :class:`str`
+            The secret shared with the agents.
+        clips_path: :class:`str`
+            The path to store fetched clips in.
+        on_replay: Callable[[:class:`str`, :class:`dict`], None]
+            Called with the agent's name and the event whenever an agent saves a replay.
+
+        Raises
+        ------
+        ValueError
+            The secret is empty.
+        """
+        check_secret(secret)
+        self.address = address
+        self.secret = secret
+        self.clips_path = clips_path
+        self.on_replay = on_replay
+        self.agents: dict[str, _AgentConnection] = {}
+        self.owners: dict[str, str] = {}  # file name -> agent name
+        self._seen: set[tuple[str, str]] = set()
+        self._ids = itertools.count(1)
+        self._fetching: dict[str, asyncio.Task] = {}
+        self._server: asyncio.AbstractServer = None
+        self._agent_changed = asyncio.Event()
+
+    async def start(self) -> None:
+        self._server = await start_server(self._handle, self.address)
+        log.info(f"Clip hub listening on {self.address}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        nonce = secrets.token_hex(16)
+        connection = None
+        try:
+            await write_frame(writer, {"type": "challenge", "nonce": nonce})
+            header, _ = await asyncio.wait_for(read_frame(reader), timeout=10)
+            if header.get("type") != "hello" or not hmac.compare_digest(header.get("signature", ""), sign_nonce(self.secret, nonce)):
+                log.warning(f"Rejected agent {header.get('agent')}")
+                await write_frame(writer, {"type": "rejected"})
+                return
+            await write_frame(writer, {"type": "welcome"})
+            connection = _AgentConnection(header["agent"], writer)
+            self.agents[connection.name] = connection
+            self._agent_changed.set()
+            log.info(f"Agent {connection.name} connected.")
+            while True:
+                header, payload = await read_frame(reader)
+                await self._dispatch(connection, header, payload)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, OSError, ValueError) as e:
+            log.debug(f"Agent connection closed: {e!r}")
+        finally:
+            writer.close()
+            if connection is not None:
+                if self.agents.get(connection.name) is connection:
+                    del self.agents[connection.name]
+                for transfer in connection.transfers.values():
+                    transfer.fail(ConnectionError(f"Agent {connection.name} disconnected"))
+                log.info(f"Agent {connection.name} disconnected.")
+
+    async def _dispatch(self, connection:_AgentConnection, header:dict, payload:bytes) -> None:
+        kind = header["type"]
+        if kind == "replay":
+            event = header["event"]
+            self.owners[event["file"]] = connection.name
+            # Resent events were already passed on, their ack was lost
+            if (connection.name, event["file"]) not in self._seen:
+                self._seen.add((connection.name, event["file"]))
+                self.on_replay(connection.name, event)
+            # Only acked once it's been passed on, so the agent resends it if the hub goes down first
+            await write_frame(connection.writer, {"type": "ack", "file": event["file"]})
+            return
+
+        transfer = connection.transfers.get(header.get("id"))
+        if transfer is None:
+            return
+        if kind == "chunk":
+            if header["offset"] != transfer.file.tell():
+                del connection.transfers[header["id"]]
+                transfer.fail(ValueError(f"Unexpected offset for {transfer.file_name}"))
+                return
+            # Waiting for the write also stops reading from the agent until the disk catches up
+            await asyncio.to_thread(transfer.file.write, payload)
+            transfer.received += len(payload)
+        elif kind == "end":
+            del connection.transfers[header["id"]]
+            transfer.file.close()
+            asyncio.create_task(self._finish(transfer, header))
+        elif kind == "error":
+            del connection.transfers[header["id"]]
+            transfer.fail(FileNotFoundError(header["error"]))
+
+    async def _finish(self, transfer:_Transfer, header:dict) -> None:
+        digest = await asyncio.to_thread(hash_file, transfer.part_path)
+        if digest != header["sha256"]:
+            os.remove(transfer.part_path)  # Start over next time
+            transfer.future.set_exception(ValueError(f"Checksum mismatch for {transfer.file_name}"))
+            return
+        path = os.path.join(self.clips_path, transfer.file_name)
+        try:
+            os.replace(transfer.part_path, path)
+        except OSError as e:
+            transfer.future.set_exception(e)
+            return
+        transfer.future.set_result(path)
+
+    async def _fetch_once(self, connection:_AgentConnection, file_name:str) -> str:
+        part_path = os.path.join(self.clips_path, file_name + ".part")
+        future = asyncio.get_running_loop().create_future()
+        transfer = _Transfer(file_name, part_path, future)
+        offset = transfer.file.tell()
+        request_id = next(self._ids)
+        connection.transfers[request_id] = transfer
+        await write_frame(connection.writer, {"type": "fetch", "id": request_id, "file": file_name, "offset": offset})
+        if offset:
+            log.info(f"Resuming {file_name} from {connection.name} at byte {offset}")
+        # Large clips can take a while, so only give up when nothing arrives for a while
+        received = 0
+        while True:
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout=self.STALL_TIMEOUT)
+            except asyncio.TimeoutError:
+                if transfer.received == received:
+                    break
+                received = transfer.received
+        if connection.transfers.get(request_id) is transfer:
+            del connection.transfers[request_id]
+            transfer.fail(ConnectionError(f"Agent {connection.name} stopped sending {file_name}"))
+            try:
+                # Otherwise the agent keeps sending this transfer alongside the retry
+                await asyncio.wait_for(write_frame(connection.writer, {"type": "cancel", "id": request_id}), timeout=self.STALL_TIMEOUT)
+            except (asyncio.TimeoutError, ConnectionError, OSError):
+                # The connection itself is stuck, so drop it and let the agent reconnect
+                connection.writer.close()
+        return await future
+
+    async def _wait_for_agent(self, name:str) -> Optional[_AgentConnection]:
+        async def wait():
+            while name not in self.agents:
+                self._agent_changed.clear()
+                await self._agent_changed.wait()
+        try:
+            await asyncio.wait_for(wait(), timeout=self.RECONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        return self.agents[name]
+
+    async def fetch(self, file_name:str) -> str:
+        """
+        Get a clip from the agent that saved it, unless it's already here.
+
+        Parameters
+        ----------
+        file_name: :class:`str`
+            The file name of the clip.
+
+        Returns
+        -------
+        :class:`str`
+            The local path to the clip.
+
+        Raises
+        ------
+        FileNotFoundError
+            No agent has the clip.
+        ConnectionError
+            The transfer kept failing.
+        """
+        file_name = os.path.basename(file_name)
+        path = os.path.join(self.clips_path, file_name)
+        if os.path.exists(path):
+            return path
+        # Share one transfer between everyone asking for the same clip
+        if file_name not in self._fetching:
+            task = asyncio.create_task(self._fetch(file_name))
+            self._fetching[file_name] = task
+            task.add_done_callback(lambda _: self._fetching.pop(file_name, None))
+        return await asyncio.shield(self._fetching[file_name])
+
+    async def _fetch(self, file_name:str) -> str:
+        owner = self.owners.get(file_name)
+        if owner is None:
+            # The hub restarted since the replay, so ask every agent
+            for connection in list(self.agents.values()):
+                try:
+                    return await self._fetch_once(connection, file_name)
+                except (FileNotFoundError, ConnectionError):
+                    continue
+            raise FileNotFoundError(f"No agent has {file_name}")
+
+        error = None
+        for _ in range(self.FETCH_ATTEMPTS):
+            connection = self.agents.get(owner) or await self._wait_for_agent(owner)
+            if connection is None:
+                raise ConnectionError(f"Agent {owner} is not connected")
+            try:
+                return await self._fetch_once(connection, file_name)
+            except (ConnectionError, ValueError) as e:
+                log.warning(f"Fetching {file_name} from {owner} failed: {e}")
+                error = e
+        raise ConnectionError(f"Could not fetch {file_name} from {owner}: {error}")
@@ -0,0 +1,211 @@
+from __future__ import annotations
+import os, sys, shutil, asyncio, logging, subprocess
+from typing import Optional
+from config import config
+
+# Add type checking for the bot variable
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from bot import OBSClipper
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;141;1mremux\u001b[0m")
+
+
+def get_ffprobe_path() -> str:
+    """
+    Get the path to ffprobe, which is expected to be next to ffmpeg.
+    """
+    directory, name = os.path.split(config.ffmpeg_path)
+    return os.path.join(directory, name.replace("ffmpeg", "ffprobe"))
+
+
+def low_priority_kwargs() -> dict:
+    """
+    Get the keyword arguments for :func:`asyncio.create_subprocess_exec` that start a process at a lower priority than OBS on Windows.
+    Elsewhere this is done by :func:`low_priority_prefix`.
+    """
+    if sys.platform == "win32":
+        return {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+    return {}
+
+
+def low_priority_prefix() -> list[str]:
+    """
+    Get a command prefix that runs a process at a lower CPU priority than OBS and, if the platform supports it, idle disk I/O priority.
+    """
+    prefix = []
+    # Not preexec_fn, which can deadlock the child when the bot has other threads running
+    if sys.platform != "win32" and shutil.which("nice"):
+        prefix += ["nice", "-n", "10"]
+    if sys.platform.startswith("linux") and shutil.which("ionice"):
+        prefix += ["ionice", "-c3"]
+    return prefix
+
+
+async def get_duration(filepath:str) -> Optional[float]:
+    """
+    Get the duration of a video with ffprobe.
+
+    Parameters
+    ----------
+    filepath: :class:`str`
+        The path to the video.
+
+    Returns
+    -------
+    Optional[:class:`float`]
+        The duration in seconds, or ``None`` if ffprobe isn't available or failed.
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            get_ffprobe_path(), "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", filepath,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError:
+        return None
+    stdout, _ = await proc.communicate()
+    try:
+        return float(stdout.decode().strip())
+    except ValueError:
+        return None
+
+
+class RemuxPool:
+    """
+    Remuxes mkv replays to mp4 with ffmpeg when OBS hasn't done it already.
+    Remuxes run at a low priority, and wait until the main user leaves VC so they don't fight OBS for the disk while it records.
+    """
+    # How long to wait for OBS to write the mp4 itself
+    OBS_GRACE_PERIOD = 5
+    # How often a waiting remux checks if the main user has left VC, in seconds
+    SESSION_POLL_INTERVAL = 5
+    # Allowed differences between the mkv and the mp4
+    MIN_SIZE_RATIO = 0.9
+    MAX_DURATION_DIFFERENCE = 0.5
+
+    def __init__(self, bot, workers:int = 1) -> None:
+        """
+        Initialize the pool.
+
+        Parameters
+        ----------
+        bot: :class:`OBSClipper`
+            The bot instance, used to check if the main user is in VC.
+        workers: :class:`int`
+            The maximum number of remuxes at once.
+        """
+        self.bot: OBSClipper = bot
+        self._workers = asyncio.Semaphore(max(1, workers))
+        self._running: set[str] = set()  # mkv paths being remuxed right now
+
+    @staticmethod
+    def mp4_path(filepath:str) -> str:
+        return filepath[:-4] + ".mp4" if filepath.endswith(".mkv") else filepath
+
+    def is_running(self, mkv_path:str) -> bool:
+        """
+        Check if ffmpeg is remuxing an mkv right now, rather than it waiting for its turn.
+        """
+        return mkv_path in self._running
+
+    async def wait_for_obs(self, mp4_path:str) -> bool:
+        """
+        Wait for OBS to finish writing an mp4 itself.
+
+        Parameters
+        ----------
+        mp4_path: :class:`str`
+            The path to the mp4.
+
+        Returns
+        -------
+        :class:`bool`
+            True if the mp4 appeared within :attr:`OBS_GRACE_PERIOD` and stopped growing.
+        """
+        last_size = -1
+        waited = 0.0
+        # Keep waiting while OBS is still writing, but not forever
+        while waited < self.OBS_GRACE_PERIOD * 10:
+            if os.path.exists(mp4_path):
+                size = os.path.getsize(mp4_path)
+                if size > 0 and size == last_size:
+                    return True
+                last_size = size
+            elif waited >= self.OBS_GRACE_PERIOD:
+                return False
+            await asyncio.sleep(0.5)
+            waited += 0.5
+        return False
+
+    async def verify(self, mkv_path:str, mp4_path:str) -> bool:
+        """
+        Check that a remuxed mp4 matches its mkv by size and duration.
+        """
+        mkv_size, mp4_size = os.path.getsize(mkv_path), os.path.getsize(mp4_path)
+        if mp4_size < mkv_size * self.MIN_SIZE_RATIO:
+            log.warning(f"Remuxed file is too small: {mp4_size} bytes (mkv is {mkv_size} bytes)")
+            return False
+        mkv_duration, mp4_duration = await asyncio.gather(get_duration(mkv_path), get_duration(mp4_path))
+        if mkv_duration is None or mp4_duration is None:
+            log.debug("Could not get durations, only checked size.")
+            return True
+        if abs(mkv_duration - mp4_duration) > self.MAX_DURATION_DIFFERENCE:
+            log.warning(f"Remuxed duration {mp4_duration}s doesn't match mkv duration {mkv_duration}s")
+            return False
+        return True
+
+    async def _run_ffmpeg(self, mkv_path:str, mp4_path:str) -> bool:
+        tmp_path = mp4_path + ".part"
+        cmd = low_priority_prefix() + [
+            config.ffmpeg_path, "-nostdin", "-y", "-loglevel", "error",
+            "-i", mkv_path, "-map", "0", "-c", "copy", "-movflags", "+faststart", "-f", "mp4", tmp_path
+        ]
+        try:
+            proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE, **low_priority_kwargs())
+        except OSError as e:
+            log.error(f"Could not start ffmpeg: {e}")
+            return False
+        _, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            log.error(f"ffmpeg failed to remux {mkv_path}: {stderr.decode(errors='replace').strip()}")
+        elif await self.verify(mkv_path, tmp_path):
+            os.replace(tmp_path, mp4_path)
+            return True
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    async def remux(self, mkv_path:str) -> Optional[str]:
+        """
+        Get the mp4 of a replay, remuxing it if OBS didn't. Remuxing waits until the main user leaves VC.
+
+        Parameters
+        ----------
+        mkv_path: :class:`str`
+            The path to the mkv replay.
+
+        Returns
+        -------
+        Optional[:class:`str`]
+            The path to the mp4, or ``None`` if the remux failed.
+        """
+        mp4_path = self.mp4_path(mkv_path)
+        if await self.wait_for_obs(mp4_path):
+            log.info(f"OBS remuxed {os.path.basename(mp4_path)}")
+            return mp4_path
+
+        if self.bot.RECORD_USERS:
+            log.info(f"Remuxing {os.path.basename(mkv_path)} once the main user leaves VC")
+        async with self._workers:
+            # Checked after getting a worker, since a session may have started while waiting for one
+            while self.bot.RECORD_USERS:
+                await asyncio.sleep(self.SESSION_POLL_INTERVAL)
+            self._running.add(mkv_path)
+            try:
+                ok = await self._run_ffmpeg(mkv_path, mp4_path)
+            finally:
+                self._running.discard(mkv_path)
+        if ok:
+            log.info(f"Remuxed {os.path.basename(mkv_path)} to mp4")
+            return mp4_path
+        return None
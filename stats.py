@@ -0,0 +1,311 @@
+from __future__ import annotations
+import os, json, asyncio, logging, heapq
+from datetime import datetime
+from typing import Optional
+from utils import parse_clip_time, CLIP_EXTENSIONS
+
+log = logging.getLogger("VC_Bot.\u001b[38;5;45;1mstats\u001b[0m")
+
+STATS_FILE = ".obsclipper_stats.json"
+LEDGER_FILE = ".obsclipper_clips.jsonl"
+
+
+def _new_counters() -> dict:
+    return {
+        "clips": 0,
+        "bytes": 0,
+        "uploaded": 0,
+        "first": None,  # Timestamp of the first clip in this scope
+        "last": None,   # Timestamp of the latest clip in this scope
+        "apps": {},
+        "people": {},
+    }
+
+
+class ClipStats:
+    """
+    Materialized clip counters for guilds and users.
+
+    Every save and upload event updates the counters in memory and appends one line to a ledger next to the clips, so recording an event and reading the stats of a scope never touch the clip history.
+    The counters are snapshotted with the ledger's length by :meth:`run` and at shutdown. On load, the ledger is replayed from that point, and the per-clip index is rebuilt from the ledger.
+    """
+    # How often the counters are snapshotted, in seconds
+    SNAPSHOT_INTERVAL = 300
+
+    def __init__(self, clips_path: str) -> None:
+        """
+        Initialize the stats and load the saved counters.
+
+        Parameters
+        ----------
+        clips_path: :class:`str`
+            The path to the clips folder. The counters and the ledger are stored here.
+        """
+        self.clips_path = clips_path
+        self.stats_path = os.path.join(clips_path, STATS_FILE)
+        self.ledger_path = os.path.join(clips_path, LEDGER_FILE)
+        self._scopes: dict[str, dict] = {}
+        self._clips: dict[str, dict] = {}  # clip name without extension -> {"scopes": [...], "size": int, "uploaded": bool}
+        self._ledger_size = 0  # Bytes of the ledger reflected in the counters
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def guild_scope(guild_id: int) -> str:
+        return f"guild:{guild_id}"
+
+    @staticmethod
+    def user_scope(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def clip_key(file_name: str) -> str:
+        """
+        Get the key of a clip, so the mkv and its remuxed mp4 are counted as one clip.
+        """
+        return os.path.splitext(os.path.basename(file_name))[0]
+
+    def load(self) -> None:
+        """
+        Load the counters from disk and replay the ledger after them, rebuilding them if they are missing or corrupt.
+        """
+        try:
+            with open(self.stats_path, "r") as f:
+                data = json.load(f)
+            scopes, offset = data["scopes"], data["ledger_offset"]
+        except FileNotFoundError:
+            self.rebuild()
+            return
+        except (ValueError, KeyError) as e:
+            log.warning(f"Clip stats are corrupt ({e}), rebuilding...")
+            self.rebuild()
+            return
+        self._scopes = scopes
+        if not self._replay(offset):
+            log.warning("Clip ledger is shorter than the saved stats, rebuilding...")
+            self.rebuild()
+            return
+        log.info(f"Loaded clip stats for {len(self._clips)} clips.")
+
+    def _replay(self, offset: int) -> bool:
+        # Index every clip in the ledger, but only count the events after the offset
+        self._clips = {}
+        position = 0
+        try:
+            with open(self.ledger_path, "rb") as f:
+                for line in f:
+                    count = position >= offset
+                    position += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn write at the end of the ledger
+                    if entry.get("event") == "save":
+                        self._apply_save(entry["file"], entry["size"], entry.get("app"), entry.get("people", []), entry.get("guild"), entry["time"], count)
+                    elif entry.get("event") == "upload":
+                        self._apply_upload(entry["file"], count)
+                    elif entry.get("event") == "rename":
+                        self._apply_rename(entry["old"], entry["new"], entry.get("size"), count)
+        except FileNotFoundError:
+            pass
+        self._ledger_size = position
+        if position > offset:
+            self._dirty = True
+        return position >= offset
+
+    def save(self) -> None:
+        """
+        Write a snapshot of the counters to disk atomically.
+        """
+        self._write(self._snapshot())
+        self._dirty = False
+
+    def _snapshot(self) -> str:
+        return json.dumps({"scopes": self._scopes, "ledger_offset": self._ledger_size})
+
+    def _write(self, data: str) -> None:
+        tmp_path = self.stats_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.stats_path)
+        except OSError as e:
+            log.error(f"Failed to save clip stats: {e}")
+
+    async def run(self) -> None:
+        """
+        Snapshot the counters every :attr:`SNAPSHOT_INTERVAL` seconds if they changed, without blocking the event loop.
+        """
+        while True:
+            await asyncio.sleep(self.SNAPSHOT_INTERVAL)
+            if self._dirty:
+                # Serialized here so the counters can't change under the thread
+                data = self._snapshot()
+                self._dirty = False
+                await asyncio.to_thread(self._write, data)
+
+    def _append_ledger(self, entry: dict) -> None:
+        line = (json.dumps(entry) + "\n").encode()
+        try:
+            with open(self.ledger_path, "ab") as f:
+                f.write(line)
+            self._ledger_size += len(line)
+            self._dirty = True
+        except OSError as e:
+            log.error(f"Failed to append to clip ledger: {e}")
+
+    def _apply_save(self, file_name: str, size: int, app: Optional[str], people: list[int], guild_id: Optional[int], timestamp: float, count: bool = True) -> None:
+        key = self.clip_key(file_name)
+        if key in self._clips:
+            return  # Already counted
+        scopes = [self.user_scope(user_id) for user_id in people]
+        if guild_id is not None:
+            scopes.append(self.guild_scope(guild_id))
+        self._clips[key] = {"scopes": scopes, "size": size, "uploaded": False}
+        if not count:
+            return  # Already in the snapshot
+        for scope in scopes:
+            counters = self._scopes.setdefault(scope, _new_counters())
+            counters["clips"] += 1
+            counters["bytes"] += size
+            if counters["first"] is None or timestamp < counters["first"]:
+                counters["first"] = timestamp
+            if counters["last"] is None or timestamp > counters["last"]:
+                counters["last"] = timestamp
+            if app:
+                counters["apps"][app] = counters["apps"].get(app, 0) + 1
+            for user_id in people:
+                user_key = str(user_id)
+                counters["people"][user_key] = counters["people"].get(user_key, 0) + 1
+
+    def _apply_upload(self, file_name: str, count: bool = True) -> None:
+        clip = self._clips.get(self.clip_key(file_name))
+        if clip is None or clip["uploaded"]:
+            return  # Unknown clip or already uploaded once
+        clip["uploaded"] = True
+        if not count:
+            return
+        for scope in clip["scopes"]:
+            if scope in self._scopes:
+                self._scopes[scope]["uploaded"] += 1
+
+    def _apply_rename(self, old: str, new: str, size: Optional[int] = None, count: bool = True) -> None:
+        clip = self._clips.pop(self.clip_key(old), None)
+        if clip is None:
+            return
+        self._clips[self.clip_key(new)] = clip
+        if size is None:
+            return
+        previous, clip["size"] = clip["size"], size
+        if not count:
+            return
+        for scope in clip["scopes"]:
+            if scope in self._scopes:
+                self._scopes[scope]["bytes"] += size - previous
+
+    def record_save(self, file_name: str, size: int, app: Optional[str], people: list[int], guild_id: Optional[int]) -> None:
+        """
+        Count a saved clip.
+
+        Parameters
+        ----------
+        file_name: :class:`str`
+            The file name of the clip.
+        size: :class:`int`
+            The size of the clip in bytes.
+        app: Optional[:class:`str`]
+            The active window when the clip was saved.
+        people: :class:`list[int]`
+            The IDs of the users in VC when the clip was saved.
+        guild_id: Optional[:class:`int`]
+            The guild the clip belongs to.
+        """
+        clip_time = parse_clip_time(file_name)
+        timestamp = clip_time.timestamp() if clip_time else datetime.now().timestamp()
+        self._apply_save(file_name, size, app, people, guild_id, timestamp)
+        self._append_ledger({"event": "save", "file": file_name, "size": size, "app": app, "people": people, "guild": guild_id, "time": timestamp})
+
+    def record_upload(self, file_name: str) -> None:
+        """
+        Mark a clip as uploaded. Uploading the same clip again is not counted twice.
+
+        Parameters
+        ----------
+        file_name: :class:`str`
+            The file name of the clip.
+        """
+        self._apply_upload(file_name)
+        self._append_ledger({"event": "upload", "file": file_name})
+
+    def rename(self, old: str, new: str, size: Optional[int] = None) -> None:
+        """
+        Move a clip's stats to a new file name, e.g. when it's merged into another clip.
+
+        Parameters
+        ----------
+        old: :class:`str`
+            The old file name of the clip.
+        new: :class:`str`
+            The new file name of the clip.
+        size: Optional[:class:`int`]
+            The size of the clip in bytes under its new name, if it changed.
+        """
+        if self.clip_key(old) == self.clip_key(new) and size is None:
+            return
+        self._apply_rename(old, new, size)
+        self._append_ledger({"event": "rename", "old": old, "new": new, "size": size})
+
+    def rebuild(self) -> None:
+        """
+        Rebuild the counters from the ledger and the clips folder.
+        Clips in the folder that are missing from the ledger are counted without an app, people or guild.
+        """
+        log.info("Rebuilding clip stats...")
+        self._scopes = {}
+        self._replay(0)
+
+        try:
+            entries = list(os.scandir(self.clips_path))
+        except OSError as e:
+            log.warning(f"Could not scan clips folder: {e}")
+            entries = []
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith(CLIP_EXTENSIONS) or self.clip_key(entry.name) in self._clips:
+                continue
+            clip_time = parse_clip_time(entry.name)
+            timestamp = clip_time.timestamp() if clip_time else entry.stat().st_mtime
+            self._apply_save(entry.name, entry.stat().st_size, None, [], None, timestamp)
+            # Keep the ledger complete, so the clip index can be rebuilt from it alone
+            self._append_ledger({"event": "save", "file": entry.name, "size": entry.stat().st_size, "app": None, "people": [], "guild": None, "time": timestamp})
+        log.info(f"Rebuilt clip stats for {len(self._clips)} clips.")
+        self.save()
+
+    def get(self, scope: str, top: int = 3) -> Optional[dict]:
+        """
+        Get a summary of the counters of a scope.
+
+        Parameters
+        ----------
+        scope: :class:`str`
+            The scope, from :meth:`guild_scope` or :meth:`user_scope`.
+        top: :class:`int`
+            How many apps and people to include.
+
+        Returns
+        -------
+        Optional[:class:`dict`]
+            The summary, or ``None`` if the scope has no clips.
+        """
+        counters = self._scopes.get(scope)
+        if not counters or not counters["clips"]:
+            return None
+        days = max(1.0, (counters["last"] - counters["first"]) / 86400)
+        return {
+            "clips": counters["clips"],
+            "clips_per_day": round(counters["clips"] / days, 2),
+            "bytes": counters["bytes"],
+            "uploaded": counters["uploaded"],
+            "ignored": counters["clips"] - counters["uploaded"],
+            "apps": heapq.nlargest(top, counters["apps"].items(), key=lambda item: item[1]),
+            "people": heapq.nlargest(top, counters["people"].items(), key=lambda item: item[1]),
+        }
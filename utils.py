@@ -1,8 +1,34 @@
 
 import logging
+from datetime import datetime
+from typing import Optional
 
 log = logging.getLogger("VC_Bot.\u001b[38;5;226;1mutils\u001b[0m")
 
+CLIP_EXTENSIONS = (".mp4", ".mkv")
+
+
+def parse_clip_time(file_name: str) -> Optional[datetime]:
+    """
+    Get the time a clip was saved from its file name.
+    Example: Replay_2025-04-06_18-05-52.mp4
+
+    Parameters
+    ----------
+    file_name: :class:`str`
+        The file name (or path) of the clip.
+
+    Returns
+    -------
+    Optional[:class:`datetime.datetime`]
+        The time of the clip, or ``None`` if the file name has no timestamp.
+    """
+    time_str = "-".join(file_name.replace("\\", "/").split("/")[-1].split(".")[0].split("_")[1:4])
+    try:
+        return datetime.strptime(time_str, "%Y-%m-%d-%H-%M-%S")
+    except ValueError:
+        return None
+
 class CustomFormatter(logging.Formatter):
     """Logging Formatter to add colors"""
 
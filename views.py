@@ -1,9 +1,14 @@
 
-import discord, logging, os, re
+import discord, logging, os, re, time, asyncio
+from typing import Optional
 from config import config
+from utils import CLIP_EXTENSIONS
 
 log = logging.getLogger("VC_Bot.\u001b[38;5;226;1mviews\u001b[0m")
 
+MAX_ATTACHMENTS = 10  # Per message
+DEFAULT_FILESIZE_LIMIT = 10 * 1024 * 1024  # Per message, outside of a guild
+
 
 
 class DynamicUploadButton(
@@ -47,17 +52,19 @@ class DynamicUploadButton(
     async def callback(self, interaction: discord.Interaction) -> None:
         await interaction.response.defer(thinking=True)
         log.info(f"Uploading clip {self.filepath}")
-        if os.path.exists(self.filepath):
+        if await fetch_from_agent(interaction.client, self.filepath):
             with open(self.filepath, "rb") as file:
                 # Send the file to the user
                 file = discord.File(file, filename=os.path.basename(self.filepath))
                 try:
                     await interaction.followup.send(self.message, file=file)
                     log.info(f"Uploaded clip {self.filepath}")
+                    interaction.client.clip_stats.record_upload(os.path.basename(self.filepath))
                 except discord.HTTPException as e:
                     # Handle the case where the file is too large to send
                     if e.status == 413 and "File is too large" in str(e):
-                        await interaction.followup.send("File is too large to send!", ephemeral=True)
+                        link = stream_link(interaction.client, os.path.basename(self.filepath))
+                        await interaction.followup.send("File is too large to send!" + (f" Stream it instead: {link}" if link else ""), ephemeral=True)
                         # Log name and size of the file
                         log.error(f"File too large: {self.filepath} ({round(os.path.getsize(self.filepath) / (1024 * 1024), 2)} MB)")
                     else:
@@ -77,6 +84,108 @@ class DynamicUploadButton(
         return cls(filepath=filepath, message=message, user_id=user_id)
         
 
+async def fetch_from_agent(client, filepath: str) -> bool:
+    """
+    Make sure a clip is on this machine, fetching it from the agent that saved it if the bot is a hub.
+
+    Parameters
+    ----------
+    client: :class:`OBSClipper`
+        The bot instance.
+    filepath: :class:`str`
+        The local path to the clip.
+
+    Returns
+    -------
+    :class:`bool`
+        True if the clip is on this machine.
+    """
+    if os.path.exists(filepath):
+        return True
+    if getattr(client, "hub", None) is None:
+        return False
+    try:
+        await client.hub.fetch(os.path.basename(filepath))
+    except (FileNotFoundError, ConnectionError, ValueError) as e:
+        log.warning(f"Could not fetch {filepath} from an agent: {e}")
+        return False
+    return True
+
+
+def stream_link(client, file_name: str) -> Optional[str]:
+    """
+    Get a signed clip server link to a clip.
+
+    Parameters
+    ----------
+    client: :class:`OBSClipper`
+        The bot instance.
+    file_name: :class:`str`
+        The file name of the clip.
+
+    Returns
+    -------
+    Optional[:class:`str`]
+        The link, or ``None`` if the clip server isn't running.
+    """
+    if getattr(client, "clip_server", None) is None:
+        return None
+    return client.clip_server.sign(file_name, config.clip_link_ttl)
+
+
+class DynamicStreamButton(
+    discord.ui.DynamicItem[discord.ui.Button], 
+    template=r"stream:(?P<name>Replay_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}\.(mp4|mkv))"
+    ):
+    """
+    A button that sends a link to stream a file from the clip server when clicked.
+    """
+
+    def __init__(self, filepath: str, user_id: int):
+        """
+        Initialize the button with the given filepath.
+        
+        Parameters
+        ----------
+        filepath: :class:`str`
+            The path to the file to be streamed.
+        user_id: :class:`int`
+            The ID of the user who triggered the interaction (for permission check).
+        """
+        super().__init__(
+            discord.ui.Button(
+                label="Stream Link",
+                style=discord.ButtonStyle.secondary,
+                custom_id=f"stream:{os.path.basename(filepath)}",
+            )
+        )
+        self.filepath = filepath
+        self.user_id = user_id
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user_id
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        await interaction.response.defer(thinking=True)
+        file_name = os.path.basename(self.filepath)
+        if not await fetch_from_agent(interaction.client, self.filepath):
+            await interaction.followup.send("File not found!", ephemeral=True)
+            log.warning(f"File not found: {self.filepath}")
+            return
+        link = stream_link(interaction.client, file_name)
+        if link is None:
+            await interaction.followup.send("The clip server isn't running.", ephemeral=True)
+            return
+        expires = int(time.time()) + config.clip_link_ttl
+        await interaction.followup.send(f"Stream `{file_name}` (expires <t:{expires}:R>): {link}")
+        log.info(f"Sent stream link for {file_name}")
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str], /):
+        filepath = os.path.join(config.clips_path, match.group("name"))
+        return cls(filepath=filepath, user_id=interaction.user.id)
+
+
 class DynamicUploadView(discord.ui.View):
     def __init__(self, filepath: str, message: str, user_id: int = config.user_id):
         """
@@ -94,4 +203,166 @@ class DynamicUploadView(discord.ui.View):
         
         super().__init__(timeout=None)  # Set timeout to None for no expiration
         self.add_item(DynamicUploadButton(filepath, message, user_id))
-   
\ No newline at end of file
+        if config.clip_server:
+            self.add_item(DynamicStreamButton(filepath, user_id))
+
+
+
+def recent_clips(client, limit: int = 25) -> list[str]:
+    """
+    Get the file names of the most recent clips, newest first. An mkv that was remuxed is only listed as its mp4.
+
+    Parameters
+    ----------
+    client: :class:`OBSClipper`
+        The bot instance. If it's a hub, clips saved on agents are included.
+    limit: :class:`int`
+        The maximum number of clips.
+
+    Returns
+    -------
+    :class:`list[str]`
+        The file names.
+    """
+    clips = {}
+    try:
+        for entry in os.scandir(config.clips_path):
+            if entry.is_file() and entry.name.endswith(CLIP_EXTENSIONS):
+                stem = os.path.splitext(entry.name)[0]
+                if stem not in clips or entry.name.endswith(".mp4"):
+                    clips[stem] = entry.name
+    except OSError as e:
+        log.error(f"Could not list clips: {e}")
+    if getattr(client, "hub", None) is not None:
+        for name in client.hub.owners:
+            clips.setdefault(os.path.splitext(name)[0], name)
+    # Clip names start with the time they were saved, so they sort by time
+    return [clips[stem] for stem in sorted(clips, reverse=True)[:limit]]
+
+
+def pack_clips(sizes: dict[str, int], limit: int) -> tuple[list[list[str]], list[str]]:
+    """
+    Pack clips into as few messages as possible, keeping each under the attachment count and size limits.
+
+    Parameters
+    ----------
+    sizes: :class:`dict[str, int]`
+        The size of each clip in bytes.
+    limit: :class:`int`
+        The maximum total size of a message in bytes.
+
+    Returns
+    -------
+    :class:`tuple[list[list[str]], list[str]]`
+        The clips in each message, and the clips too large for any message.
+    """
+    messages, sizes_left, too_large = [], [], []
+    # First fit, largest first
+    for name in sorted(sizes, key=sizes.get, reverse=True):
+        if sizes[name] > limit:
+            too_large.append(name)
+            continue
+        for i, message in enumerate(messages):
+            if len(message) < MAX_ATTACHMENTS and sizes_left[i] >= sizes[name]:
+                message.append(name)
+                sizes_left[i] -= sizes[name]
+                break
+        else:
+            messages.append([name])
+            sizes_left.append(limit - sizes[name])
+    return messages, too_large
+
+
+async def upload_clips(interaction: discord.Interaction, names: list[str]) -> None:
+    """
+    Upload several clips in as few messages as possible, sent in parallel, followed by a message linking to all of them.
+    The interaction must already be deferred.
+
+    Parameters
+    ----------
+    interaction: :class:`discord.Interaction`
+        The interaction to send the clips with.
+    names: :class:`list[str]`
+        The file names of the clips.
+    """
+    paths = {name: os.path.join(config.clips_path, name) for name in names}
+    found = await asyncio.gather(*[fetch_from_agent(interaction.client, path) for path in paths.values()])
+    missing = [name for name, ok in zip(names, found) if not ok]
+    sizes = {name: os.path.getsize(path) for (name, path), ok in zip(paths.items(), found) if ok}
+    limit = interaction.guild.filesize_limit if interaction.guild else DEFAULT_FILESIZE_LIMIT
+    messages, too_large = pack_clips(sizes, limit)
+    log.info(f"Uploading {len(sizes) - len(too_large)} clips in {len(messages)} messages")
+
+    async def send(part: int, clips: list[str]):
+        files = [discord.File(paths[name], filename=name) for name in clips]
+        try:
+            return await interaction.followup.send(f"Part {part}/{len(messages)}: " + ", ".join(f"`{name}`" for name in clips), files=files, wait=True)
+        finally:
+            for file in files:
+                file.close()
+
+    results = await asyncio.gather(*[send(i + 1, clips) for i, clips in enumerate(messages)], return_exceptions=True)
+    lines = []
+    uploaded = 0
+    for clips, result in zip(messages, results):
+        if isinstance(result, Exception):
+            log.error(f"Error uploading {clips}: {result}")
+            lines.append("- Failed: " + ", ".join(f"`{name}`" for name in clips))
+            continue
+        lines.append(f"- {result.jump_url}: " + ", ".join(f"`{name}`" for name in clips))
+        uploaded += len(clips)
+        for name in clips:
+            interaction.client.clip_stats.record_upload(name)
+    for name in too_large:
+        link = stream_link(interaction.client, name)
+        lines.append(f"- Too large: `{name}`" + (f" ({link})" if link else ""))
+    for name in missing:
+        lines.append(f"- Not found: `{name}`")
+    await interaction.followup.send(f"Uploaded {uploaded} of {len(names)} clips:\n" + "\n".join(lines))
+
+
+class ClipSelect(discord.ui.Select):
+    """
+    A select menu of recent clips to upload together.
+    """
+
+    def __init__(self, names: list[str]):
+        """
+        Initialize the select menu with the given clips.
+
+        Parameters
+        ----------
+        names: :class:`list[str]`
+            The file names of the clips, at most 25.
+        """
+        super().__init__(
+            placeholder="Pick clips to upload",
+            min_values=1,
+            max_values=len(names),
+            options=[discord.SelectOption(label=name) for name in names],
+        )
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        await interaction.response.defer(thinking=True)
+        self.view.stop()
+        await upload_clips(interaction, self.values)
+
+
+class UploadClipsView(discord.ui.View):
+    def __init__(self, names: list[str], user_id: int = config.user_id):
+        """
+        Initialize the view with a select menu of clips.
+
+        Parameters
+        ----------
+        names: :class:`list[str]`
+            The file names of the clips, at most 25.
+        user_id: :class:`int`
+            The ID of the user who can pick clips.
+        """
+        super().__init__(timeout=300)
+        self.user_id = user_id
+        self.add_item(ClipSelect(names))
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user_id